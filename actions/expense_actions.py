@@ -3,10 +3,41 @@ Contains all user-facing actions, including adding, editing, deleting, and listi
 Called by main.py.
 """
 from ui.table import format_table
-from ui.input_utils import input_float, input_date
+from ui.input_utils import input_float, input_date, input_optional_date
+from itertools import islice
 from ui.messages import print_message
-from datetime import datetime
+from datetime import date, datetime
 from models.transaction import Transaction
+from models.dedup import POLICIES
+from models.budget import month_key
+from models.recurring import RecurringRule, FREQUENCIES
+from models.sorted_view import parse_sort_keys, sort_permutation
+from data_io.storage import load_csv, rows_to_transactions
+from data_io.reconcile import reconcile, iter_statement, MATCHED, MISSING_IN_LEDGER, MISSING_IN_STATEMENT
+
+def id_label(transaction):
+    """
+    Return the ID to show for a transaction; recurring occurrences show their rule, e.g. 'R2'.
+    """
+    if transaction._id is None and transaction.rule_id is not None:
+        return f"R{transaction.rule_id}"
+    return transaction._id
+
+
+def warn_if_over_budget(ledger, transaction):
+    """
+    Print a warning if the transaction's category is over its budget for the transaction's month.
+    Uses the ledger's running totals, so no transactions are scanned.
+    """
+    month = month_key(transaction.date)
+    if ledger.budget.is_over(month, transaction.category):
+        spent = ledger.budget.spent(month, transaction.category)
+        limit = ledger.budget.limits[transaction.category]
+        print_message(
+            f"Warning: {transaction.category} is over budget for {month} "
+            f"(${spent:.2f} of ${limit:.2f}).", "yellow"
+        )
+
 
 def add_expense(ledger):
     """
@@ -23,6 +54,7 @@ def add_expense(ledger):
         transaction = Transaction(amount, category, date_obj.isoformat(), note)
         ledger.add(transaction)
         print_message("Transaction added successfully!", "green")
+        warn_if_over_budget(ledger, transaction)
     except Exception as e:
         print_message(f"Failed to add transaction: {e}", "red")
 
@@ -63,6 +95,9 @@ def edit_expense(ledger):
         except ValueError:
             print_message("Invalid amount. Edit cancelled.", "red")
             return
+        if new_amount <= 0:
+            print_message("Amount must be > 0. Edit cancelled.", "red")
+            return
     else:
         new_amount = None
 
@@ -97,6 +132,7 @@ def edit_expense(ledger):
     )
 
     print_message("Transaction updated.", "green")
+    warn_if_over_budget(ledger, target_transaction)
 
 
 def delete_expense(ledger):
@@ -220,7 +256,7 @@ def list_by_date_range(ledger):
     rows = []
     for transaction in result:
         rows.append([
-            transaction._id,
+            id_label(transaction),
             f"${transaction.amount:.2f}",
             transaction.category,
             transaction.date.isoformat(),
@@ -260,10 +296,360 @@ def show_total_amount(ledger):
     """
     print_message("\n=== Total Amount ===", "title")
 
-    if len(ledger) == 0:
+    # The ledger memoizes the total until the next add/update/remove.
+    # It includes recurring occurrences, so a ledger with only recurring rules still has a total.
+    total = ledger.total_amount()
+    if len(ledger) == 0 and not total:
         print_message("No expenses yet.", "yellow")
         return
 
-    # Compute total spending by summing all transaction amounts.
-    total = sum(transaction.amount for transaction in ledger)
-    print_message(f"Total: ${total}", "info")
\ No newline at end of file
+    print_message(f"Total: ${total}", "info")
+
+
+def import_expenses(ledger):
+    """
+    Import expenses from another CSV file (e.g. a bank export), skipping, merging, or reporting duplicates.
+    """
+    print_message("\n=== Import Expenses ===", "title")
+
+    path = input("CSV file to import: ").strip()
+
+    policy = input(f"Duplicates ({'/'.join(POLICIES)}, default reject): ").strip().lower() or "reject"
+    if policy not in POLICIES:
+        print_message("Invalid choice. Import cancelled.", "red")
+        return
+
+    # Fuzzy matching is optional; Enter keeps exact matching only.
+    try:
+        days = int(input("Match dates within how many days? (default 0): ").strip() or 0)
+        tolerance = float(input("Match amounts within how much? (default 0): ").strip() or 0)
+    except ValueError:
+        print_message("Invalid number. Import cancelled.", "red")
+        return
+
+    try:
+        transactions = rows_to_transactions(load_csv(path))
+        count_before = len(ledger)
+        duplicates = ledger.import_transactions(transactions, policy, days, tolerance)
+    except Exception as e:
+        print_message(f"Failed to import: {e}", "red")
+        return
+
+    print_message(f"Imported {len(ledger) - count_before} of {len(transactions)} transactions.", "green")
+
+    if not duplicates:
+        return
+
+    print_message(f"Found {len(duplicates)} duplicate(s):", "yellow")
+    rows = []
+    for new, existing in duplicates:
+        rows.append([
+            existing._id,
+            f"${new.amount:.2f}",
+            f"${existing.amount:.2f}",
+            new.category,
+            new.date.isoformat(),
+            existing.date.isoformat(),
+        ])
+
+    headers = ["ID", "Amount", "Existing Amount", "Category", "Date", "Existing Date"]
+    print(format_table(rows, headers))
+
+
+def show_budgets(ledger):
+    """
+    Display spending against budget for each category in a month, and optionally set a budget.
+    The figures come from the ledger's running totals, so no transactions are scanned.
+    """
+    print_message("\n=== Budgets ===", "title")
+
+    current_month = month_key(date.today())
+    month = input(f"Month (YYYY-MM, default {current_month}): ").strip() or current_month
+    try:
+        datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        print_message("Invalid month format. Please use YYYY-MM.", "red")
+        return
+
+    report = ledger.budget.month_report(month)
+    if report:
+        rows = []
+        for category, spent, limit in report:
+            rows.append([
+                category,
+                f"${spent:.2f}",
+                f"${limit:.2f}" if limit is not None else "-",
+                f"${limit - spent:.2f}" if limit is not None else "-",
+                "OVER" if limit is not None and spent > limit else "",
+            ])
+
+        headers = ["Category", "Spent", "Budget", "Remaining", "Status"]
+        print(format_table(rows, headers))
+    else:
+        print_message("No budgets or spending for this month.", "yellow")
+
+    # Pressing Enter leaves the budgets unchanged.
+    category = input("\nSet budget for category (Enter to skip): ").strip()
+    if not category:
+        return
+
+    limit_str = input(f"Monthly limit for '{category}' (0 to remove): ").strip()
+    try:
+        limit = float(limit_str)
+    except ValueError:
+        print_message("Invalid amount.", "red")
+        return
+
+    ledger.budget.set_limit(category, limit)
+    if limit > 0:
+        print_message(f"Budget for {category} set to ${limit:.2f}.", "green")
+    else:
+        print_message(f"Budget for {category} removed.", "green")
+
+
+def reconcile_statement(ledger):
+    """
+    Reconcile a bank statement CSV against the ledger and list the entries missing on either side.
+    Optionally adds the entries missing from the ledger.
+    """
+    print_message("\n=== Reconcile Bank Statement ===", "title")
+
+    path = input("Statement CSV file: ").strip()
+    try:
+        days = int(input("Match dates within how many days? (default 0): ").strip() or 0)
+    except ValueError:
+        print_message("Invalid number.", "red")
+        return
+
+    matched = 0
+    missing_in_ledger = []
+    missing_in_statement = []
+    try:
+        # The ledger is already in memory; sorting it gives the date order the merge needs.
+        # Recurring occurrences in the statement period are part of the ledger side too.
+        entries = reconcile(iter_statement(path), sorted(ledger), days, ledger.rules)
+        for status, statement_entry, ledger_entry in entries:
+            if status == MATCHED:
+                matched += 1
+            elif status == MISSING_IN_LEDGER:
+                missing_in_ledger.append(statement_entry)
+            elif status == MISSING_IN_STATEMENT:
+                missing_in_statement.append(ledger_entry)
+    except Exception as e:
+        print_message(f"Failed to reconcile: {e}", "red")
+        return
+
+    print_message(f"Matched {matched} transaction(s).", "green")
+
+    headers = ["ID", "Amount", "Category", "Date", "Note"]
+    for title, entries in (("Missing in ledger", missing_in_ledger), ("Missing in statement", missing_in_statement)):
+        if not entries:
+            continue
+        print_message(f"\n{title}: {len(entries)}", "yellow")
+        rows = []
+        for transaction in entries:
+            rows.append([
+                id_label(transaction) if id_label(transaction) is not None else "-",
+                f"${transaction.amount:.2f}",
+                transaction.category,
+                transaction.date.isoformat(),
+                transaction.note
+            ])
+        print(format_table(rows, headers))
+
+    if not missing_in_ledger:
+        return
+
+    choice = input(f"\nAdd the {len(missing_in_ledger)} missing transaction(s) to the ledger? (y/n): ").strip().lower()
+    if choice != "y":
+        print_message("Nothing added.", "yellow")
+        return
+
+    for transaction in missing_in_ledger:
+        ledger.add(transaction)
+    print_message(f"Added {len(missing_in_ledger)} transaction(s).", "green")
+
+
+def show_spending_stats(ledger):
+    """
+    Display approximate median, p90, and p99 expense size per category, plus a histogram of amounts.
+    Uses the ledger's per-(month, category) sketches, so no amounts are sorted.
+    """
+    print_message("\n=== Spending Statistics ===", "title")
+
+    month = input("Month (YYYY-MM, Enter for all time): ").strip() or None
+    if month is not None:
+        try:
+            datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            print_message("Invalid month format. Please use YYYY-MM.", "red")
+            return
+
+    categories = ledger.stats.categories(month)
+    if not categories:
+        print_message("No expenses recorded.", "yellow")
+        return
+
+    rows = []
+    for category in categories + [None]:
+        sketch = ledger.stats.sketch(month, category)
+        rows.append([
+            category if category is not None else "(all)",
+            sketch.count,
+            f"${sketch.quantile(0.5):.2f}",
+            f"${sketch.quantile(0.9):.2f}",
+            f"${sketch.quantile(0.99):.2f}",
+        ])
+
+    headers = ["Category", "Count", "Median", "P90", "P99"]
+    print(format_table(rows, headers))
+    print_message("Percentiles are approximate (within 1%).", "info")
+
+    histogram = ledger.stats.histogram(month)
+    largest = max(histogram.counts)
+    rows = []
+    for label, count in zip(histogram.labels(), histogram.counts):
+        bar = "#" * round(30 * count / largest) if largest else ""
+        rows.append([label, count, bar])
+
+    print(format_table(rows, ["Range", "Count", ""]))
+
+
+def list_sorted_expenses(ledger):
+    """
+    Display expenses sorted by one or more fields, optionally limited to the top N and a date range.
+    """
+    print_message("\n=== Sorted / Top Expenses ===", "title")
+
+    spec = input("Sort by (amount, category, date, id, note; '-' for descending; default -amount): ").strip() or "-amount"
+    keys = [key for key in spec.split(",") if key.strip()]
+
+    limit_str = input("How many to show? (Enter for all): ").strip()
+    try:
+        limit = int(limit_str) if limit_str else None
+    except ValueError:
+        print_message("Invalid number.", "red")
+        return
+
+    start_date = input_optional_date("Start date (YYYY-MM-DD, Enter to skip): ")
+    end_date = input_optional_date("End date (YYYY-MM-DD, Enter to skip): ")
+
+    try:
+        if limit is not None and len(keys) == 1:
+            # A single key with a limit is a top-N query: a heap of size limit instead of a full sort
+            # (top_n itself reuses the cached full sort when the limit covers most of the ledger).
+            key = keys[0].strip()
+            result = ledger.top_n(limit, key.lstrip("-+").lower(), key.startswith("-"), start_date, end_date)
+        elif start_date or end_date:
+            # A date filter includes recurring occurrences, as in the date-range listing.
+            selected = ledger.find_by_date_range(start_date or date.min, end_date or date.max)
+            permutation = sort_permutation(selected, parse_sort_keys(keys))
+            result = [selected[i] for i in islice(permutation, limit)]
+        else:
+            result = list(islice(ledger.sorted_by(*keys), limit))
+    except ValueError as e:
+        print_message(str(e), "red")
+        return
+
+    if not result:
+        print_message("No expenses found.", "yellow")
+        return
+
+    rows = []
+    for transaction in result:
+        rows.append([
+            id_label(transaction),
+            f"${transaction.amount:.2f}",
+            transaction.category,
+            transaction.date.isoformat(),
+            transaction.note
+        ])
+
+    headers = ["ID", "Amount", "Category", "Date", "Note"]
+    print(format_table(rows, headers))
+
+
+def list_recurring_rules(ledger):
+    """
+    Display all recurring expense rules in a formatted table.
+    """
+    if not ledger.rules:
+        print_message("No recurring expenses.", "yellow")
+        return
+
+    rows = []
+    for rule in ledger.rules:
+        rows.append([
+            rule._id,
+            f"${rule.amount:.2f}",
+            rule.category,
+            f"every {rule.interval} {rule.frequency}" if rule.interval > 1 else rule.frequency,
+            rule.start.isoformat(),
+            rule.end.isoformat() if rule.end else "-",
+            rule.materialized_through.isoformat() if rule.materialized_through else "-",
+            rule.note
+        ])
+
+    headers = ["ID", "Amount", "Category", "Repeats", "Start", "End", "Added Through", "Note"]
+    print(format_table(rows, headers))
+
+
+def add_recurring_rule(ledger):
+    """
+    Prompt for a new recurring expense rule and add it to the ledger.
+    """
+    amount = input_float("Amount: ")
+    category = input("Category: ")
+    start_date = input_date("Start date (YYYY-MM-DD): ")
+    end_date = input_optional_date("End date (YYYY-MM-DD, Enter for none): ")
+
+    frequency = input(f"Frequency ({'/'.join(FREQUENCIES)}, default monthly): ").strip().lower() or "monthly"
+    try:
+        interval = int(input("Repeat every how many periods? (default 1): ").strip() or 1)
+    except ValueError:
+        print_message("Invalid number.", "red")
+        return
+    note = input("Note (optional): ")
+
+    try:
+        rule = RecurringRule(
+            amount, category, start_date.isoformat(),
+            end_date.isoformat() if end_date else None,
+            frequency, interval, note
+        )
+        ledger.add_rule(rule)
+        print_message("Recurring expense added.", "green")
+    except Exception as e:
+        print_message(f"Failed to add recurring expense: {e}", "red")
+
+
+def manage_recurring(ledger):
+    """
+    Show recurring expense rules and let the user add, delete, or materialize them.
+    Occurrences are included automatically in date-range lists, monthly summaries, and totals up to today.
+    """
+    print_message("\n=== Recurring Expenses ===", "title")
+
+    list_recurring_rules(ledger)
+
+    print_message("\na. Add   d. Delete   m. Add occurrences as expenses up to a date", "info")
+    choice = input("Choose an option (Enter to go back): ").strip().lower()
+
+    if choice == "a":
+        add_recurring_rule(ledger)
+
+    elif choice == "d":
+        try:
+            rule_id = int(input("Enter ID to delete: ").strip())
+        except ValueError:
+            print_message("Invalid ID.", "red")
+            return
+        if ledger.remove_rule(rule_id):
+            print_message(f"Recurring expense {rule_id} deleted.", "green")
+        else:
+            print_message("ID not found.", "red")
+
+    elif choice == "m":
+        up_to = input_date("Add occurrences up to (YYYY-MM-DD): ")
+        added = ledger.materialize_rules(up_to)
+        print_message(f"Added {added} transaction(s).", "green")
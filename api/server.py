@@ -0,0 +1,406 @@
+"""
+Local HTTP/JSON API over a single in-memory Ledger, built on asyncio (standard library only).
+Reads are served concurrently; writes are serialized and persisted through data_io.storage.
+
+Run with:
+    python3 -m api.server --port 8080
+
+Endpoints:
+    GET    /transactions             list (filters: category, start, end), streamed in chunks
+    GET    /transactions/<id>        single transaction
+    POST   /transactions             add   (JSON body: amount, category, date, note)
+    PATCH  /transactions/<id>        update (JSON body: any of amount, category, date, note)
+    DELETE /transactions/<id>        remove
+    GET    /categories               sorted list of categories
+    GET    /summary/monthly          {"YYYY-MM": total}
+    GET    /total                    {"total": amount}
+
+Like the program's own views, totals, summaries and date-filtered lists include recurring occurrences
+(which have no "id" and carry the "rule_id" of their rule).
+"""
+import argparse
+import asyncio
+import json
+from datetime import date, datetime
+from urllib.parse import urlsplit, parse_qs
+from data_io.export import ARCHIVE_DIR
+from data_io.ledger_files import LedgerFiles
+from models.ledger import Ledger
+from models.transaction import Transaction
+
+STATUS_TEXT = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class HTTPError(Exception):
+    """
+    Raised by request handlers to send an error response with the given status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def transaction_to_dict(transaction):
+    """
+    Convert a Transaction into a JSON-serializable dictionary.
+    Recurring occurrences have no ID; rule_id names the rule they come from.
+    """
+    return {
+        "id": transaction._id,
+        "rule_id": transaction.rule_id,
+        "amount": transaction.amount,
+        "category": transaction.category,
+        "date": transaction.date.isoformat(),
+        "note": transaction.note,
+    }
+
+
+def parse_date(value, field):
+    """
+    Parse a YYYY-MM-DD string, raising HTTPError 400 on bad input.
+    """
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"Invalid {field}: {value!r}. Use YYYY-MM-DD.")
+
+
+def parse_amount(value):
+    """
+    Validate a positive numeric amount, raising HTTPError 400 on bad input.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise HTTPError(400, "Amount must be a number > 0")
+    return float(value)
+
+
+def parse_category(value):
+    """
+    Validate a non-empty category string, raising HTTPError 400 on bad input.
+    """
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, "Category must be a non-empty string")
+    return value
+
+
+class LedgerServer:
+    """
+    Serves Ledger operations over HTTP/JSON from one shared in-memory ledger.
+    """
+
+    def __init__(self, ledger, files, chunk_size=500):
+        """
+        Create a server for the given ledger.
+        Writes are saved through files (the LedgerFiles the ledger was loaded from);
+        list responses are streamed chunk_size transactions at a time.
+        """
+        self.ledger = ledger
+        self.files = files
+        self.chunk_size = chunk_size
+        # Only one write (mutation + save) may run at a time.
+        self._write_lock = asyncio.Lock()
+
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """
+        Start listening and return the asyncio server object.
+        """
+        return await asyncio.start_server(self.handle_client, host, port)
+
+
+    async def handle_client(self, reader, writer):
+        """
+        Read one HTTP request from the connection, dispatch it, and write the response.
+        """
+        try:
+            try:
+                method, path, query, body = await self._read_request(reader)
+                await self._dispatch(method, path, query, body, writer)
+            except HTTPError as e:
+                await self._send_json(writer, e.status, {"error": e.message})
+            except Exception as e:
+                await self._send_json(writer, 500, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def _read_request(self, reader):
+        """
+        Parse the request line, headers, and JSON body (if any).
+        """
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, target, _version = parts
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = headers.get("content-length", "") or "0"
+        if not (length.isascii() and length.isdigit()):
+            raise HTTPError(400, "Content-Length must be a non-negative integer")
+        length = int(length)
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "Request body too large")
+
+        body = None
+        if length:
+            raw = await reader.readexactly(length)
+            try:
+                body = json.loads(raw.decode("utf-8"))
+            except ValueError:
+                raise HTTPError(400, "Request body must be valid JSON")
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return method.upper(), url.path.rstrip("/") or "/", query, body
+
+
+    async def _dispatch(self, method, path, query, body, writer):
+        """
+        Route a parsed request to the matching handler.
+        """
+        segments = [segment for segment in path.split("/") if segment]
+
+        if segments == ["transactions"]:
+            if method == "GET":
+                return await self._list_transactions(query, writer)
+            if method == "POST":
+                return await self._add_transaction(body, writer)
+            raise HTTPError(405, "Use GET or POST")
+
+        if len(segments) == 2 and segments[0] == "transactions":
+            try:
+                transaction_id = int(segments[1])
+            except ValueError:
+                raise HTTPError(400, "Transaction ID must be an integer")
+
+            if method == "GET":
+                transaction = self._find(transaction_id)
+                return await self._send_json(writer, 200, transaction_to_dict(transaction))
+            if method == "PATCH":
+                return await self._update_transaction(transaction_id, body, writer)
+            if method == "DELETE":
+                return await self._remove_transaction(transaction_id, writer)
+            raise HTTPError(405, "Use GET, PATCH or DELETE")
+
+        if method != "GET":
+            raise HTTPError(405, "Use GET")
+
+        if segments == ["categories"]:
+            return await self._send_json(writer, 200, sorted(self.ledger.unique_categories()))
+        if segments == ["summary", "monthly"]:
+            return await self._send_json(writer, 200, self.ledger.monthly_summary())
+        if segments == ["total"]:
+            return await self._send_json(writer, 200, {"total": self.ledger.total_amount()})
+
+        raise HTTPError(404, f"Unknown path: {path}")
+
+
+    def _find(self, transaction_id):
+        """
+        Return the transaction with the given ID, raising HTTPError 404 if missing.
+        """
+        transaction = next((t for t in self.ledger if t._id == transaction_id), None)
+        if transaction is None:
+            raise HTTPError(404, "No transaction found with that ID")
+        return transaction
+
+
+    async def _list_transactions(self, query, writer):
+        """
+        Stream the transactions matching the query filters as a JSON array.
+        """
+        start = parse_date(query["start"], "start") if "start" in query else None
+        end = parse_date(query["end"], "end") if "end" in query else None
+
+        # Take a snapshot list so concurrent writes cannot change the sequence mid-stream.
+        if start is not None or end is not None:
+            results = self.ledger.find_by_date_range(start or date.min, end or date.max)
+            if "category" in query:
+                results = [t for t in results if t.category == query["category"]]
+        elif "category" in query:
+            results = self.ledger.find_by_category(query["category"])
+        else:
+            results = list(self.ledger)
+
+        await self._stream_json_array(writer, results)
+
+
+    async def _add_transaction(self, body, writer):
+        """
+        Create a transaction from the JSON body, add it, and save.
+        """
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+
+        try:
+            transaction = Transaction(
+                parse_amount(body.get("amount")),
+                parse_category(body.get("category")),
+                body.get("date"),
+                body.get("note", "") or "",
+            )
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+
+        async with self._write_lock:
+            self.ledger.add(transaction)
+            await self._persist()
+
+        await self._send_json(writer, 201, transaction_to_dict(transaction))
+
+
+    async def _update_transaction(self, transaction_id, body, writer):
+        """
+        Apply the fields present in the JSON body to an existing transaction, then save.
+        """
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+
+        fields = {}
+        if "amount" in body:
+            fields["amount"] = parse_amount(body["amount"])
+        if "category" in body:
+            fields["category"] = parse_category(body["category"])
+        if "date" in body:
+            fields["date"] = parse_date(body["date"], "date")
+        if "note" in body:
+            fields["note"] = str(body["note"] or "")
+
+        async with self._write_lock:
+            if not self.ledger.update(transaction_id, **fields):
+                raise HTTPError(404, "No transaction found with that ID")
+            await self._persist()
+
+        await self._send_json(writer, 200, transaction_to_dict(self._find(transaction_id)))
+
+
+    async def _remove_transaction(self, transaction_id, writer):
+        """
+        Remove a transaction by ID, then save.
+        """
+        async with self._write_lock:
+            if not self.ledger.remove(transaction_id):
+                raise HTTPError(404, "No transaction found with that ID")
+            await self._persist()
+
+        await self._send_json(writer, 200, {"removed": transaction_id})
+
+
+    async def _persist(self):
+        """
+        Save the ledger through data_io without blocking the event loop.
+        The caller must hold the write lock, so the ledger does not change while it is saved.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.files.save, self.ledger)
+
+
+    async def _send_json(self, writer, status, payload):
+        """
+        Write a complete JSON response.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+    async def _stream_json_array(self, writer, transactions):
+        """
+        Write transactions as a JSON array using chunked transfer encoding.
+        Each chunk holds up to chunk_size transactions, so memory stays bounded for large lists.
+        """
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/json\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1"))
+
+        self._write_chunk(writer, b"[")
+        for start in range(0, len(transactions), self.chunk_size):
+            batch = transactions[start:start + self.chunk_size]
+            items = ",".join(json.dumps(transaction_to_dict(t)) for t in batch)
+            self._write_chunk(writer, (("," if start else "") + items).encode("utf-8"))
+            # Let other clients run between chunks.
+            await writer.drain()
+        self._write_chunk(writer, b"]")
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+    def _write_chunk(self, writer, data):
+        """
+        Write a single chunk in HTTP chunked encoding.
+        """
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+
+
+def load_ledger(files):
+    """
+    Load a Ledger (including archived months and recurring rules) from the given LedgerFiles.
+    The server does not change rules, so they are never saved back.
+    """
+    ledger = Ledger()
+    files.load_rules(ledger)
+    files.load(ledger)
+    return ledger
+
+
+async def serve(filepath, archive_dir, host, port):
+    """
+    Load the ledger and serve it until cancelled.
+    """
+    files = LedgerFiles(filepath, archive_dir)
+    ledger = load_ledger(files)
+    server = await LedgerServer(ledger, files).start(host, port)
+    print(f"Serving {len(ledger)} transactions on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ledger Shredder JSON API server")
+    parser.add_argument("--file", default="data/expenses.csv", help="CSV file to load and save")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Archived months, loaded with the CSV file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.file, args.archive_dir, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
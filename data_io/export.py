@@ -0,0 +1,365 @@
+"""
+Streaming export of transactions to CSV or JSON Lines, optionally gzip/xz-compressed,
+and archiving of closed months into compressed per-month CSV files.
+Exports work one transaction at a time, so memory use does not grow with the ledger;
+archiving only holds the rows of the months being archived, and writes one month at a time.
+
+Run with:
+    python3 -m data_io.export export out.jsonl.gz --start 2025-01-01 --category Food
+    python3 -m data_io.export archive --before 2025-12
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from models.sketch import QuantileSketch
+from data_io.storage import (
+    COMPRESSORS,
+    FIELDNAMES,
+    atomic_output,
+    commit_staged,
+    discard_staged,
+    iter_csv,
+    iter_transactions,
+    row_to_transaction,
+    staged_output,
+    transaction_to_row,
+    write_csv_atomic,
+    write_lock,
+)
+
+FORMATS = ("csv", "jsonl")
+ARCHIVE_DIR = "data/archive"
+
+
+def detect_format(path):
+    """
+    Return 'csv' or 'jsonl' based on the file name, ignoring any compression suffix.
+    """
+    p = Path(path)
+    if p.suffix in COMPRESSORS:
+        p = p.with_suffix("")
+    fmt = p.suffix.lstrip(".")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {path}. Use .csv or .jsonl (optionally .gz/.xz).")
+    return fmt
+
+
+def filter_transactions(transactions, start_date=None, end_date=None, category=None):
+    """
+    Yield the transactions within [start_date, end_date] (inclusive) and matching category.
+    Any filter left as None is ignored.
+    """
+    for transaction in transactions:
+        if start_date is not None and transaction.date < start_date:
+            continue
+        if end_date is not None and transaction.date > end_date:
+            continue
+        if category is not None and transaction.category != category:
+            continue
+        yield transaction
+
+
+def write_transactions(transactions, stream, fmt="csv", flush=False):
+    """
+    Write transactions to an open text stream in the given format and return how many were written.
+    With flush=True each record is flushed as soon as it is written (useful for pipes).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=FIELDNAMES)
+        writer.writeheader()
+
+    for transaction in transactions:
+        row = transaction_to_row(transaction)
+        if fmt == "csv":
+            writer.writerow(row)
+        else:
+            stream.write(json.dumps(row) + "\n")
+        count += 1
+        if flush:
+            stream.flush()
+
+    return count
+
+
+def export_transactions(transactions, path, start_date=None, end_date=None, category=None):
+    """
+    Stream the (filtered) transactions into path and return how many were written.
+    The format and compression come from the file name, e.g. 'out.csv', 'out.jsonl.xz'.
+    """
+    fmt = detect_format(path)
+    selected = filter_transactions(transactions, start_date, end_date, category)
+
+    with write_lock(path):
+        with atomic_output(path) as f:
+            return write_transactions(selected, f, fmt)
+
+
+def archive_path(archive_dir, month_key, compression=".xz"):
+    """
+    Return the archive file path for a 'YYYY-MM' month.
+    """
+    return Path(archive_dir) / f"{month_key}.csv{compression}"
+
+
+def archived_months(archive_dir=ARCHIVE_DIR):
+    """
+    Return a dictionary mapping 'YYYY-MM' → archive file path for every archived month.
+    """
+    months = {}
+    p = Path(archive_dir)
+    if not p.exists():
+        return months
+
+    for path in sorted(p.glob("*.csv*")):
+        month_key = path.name.split(".")[0]
+        if path.name.startswith(".") or path.name.endswith((".lock", ".tmp")):
+            continue
+        months[month_key] = path
+    return months
+
+
+def metadata_path(archive_file):
+    """
+    Return the metadata file path for an archive file, e.g. '2025-11.csv.xz' → '2025-11.meta.json'.
+    """
+    p = Path(archive_file)
+    return p.with_name(p.name.split(".")[0] + ".meta.json")
+
+
+class PartitionSummary:
+    """
+    Accumulates the metadata of one archived month: count, total, and amount sketches
+    for the month as a whole and for each category.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.sketch = QuantileSketch()
+        self.category_sketches = {}
+
+
+    def add(self, category, amount):
+        """
+        Include one transaction amount.
+        """
+        self.count += 1
+        self.total += amount
+        self.sketch.add(amount)
+        self.category_sketches.setdefault(category, QuantileSketch()).add(amount)
+
+
+    def to_dict(self):
+        """
+        Return a JSON-serializable representation of the summary.
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "sketch": self.sketch.to_dict(),
+            "categories": {
+                category: sketch.to_dict() for category, sketch in sorted(self.category_sketches.items())
+            },
+        }
+
+
+def save_partition_metadata(archive_file, transactions):
+    """
+    Write the metadata file for an archive from its transactions.
+    """
+    summary = PartitionSummary()
+    for transaction in transactions:
+        summary.add(transaction.category, transaction.amount)
+    _save_metadata(archive_file, summary)
+
+
+def _save_metadata(archive_file, summary):
+    """
+    Write a PartitionSummary to the archive's metadata file.
+    """
+    path = metadata_path(archive_file)
+    with write_lock(path):
+        with atomic_output(path) as f:
+            json.dump(summary.to_dict(), f, indent=1)
+
+
+def load_partition_metadata(archive_dir=ARCHIVE_DIR):
+    """
+    Return a dictionary mapping 'YYYY-MM' → metadata for every archived month with a metadata file.
+    The "sketch" and "categories" entries are rebuilt as QuantileSketch objects.
+    """
+    metadata = {}
+    for month_key, archive_file in archived_months(archive_dir).items():
+        path = metadata_path(archive_file)
+        if not path.exists():
+            continue
+        with path.open(encoding="utf-8") as f:
+            data = json.load(f)
+        data["sketch"] = QuantileSketch.from_dict(data["sketch"])
+        data["categories"] = {
+            category: QuantileSketch.from_dict(sketch) for category, sketch in data["categories"].items()
+        }
+        metadata[month_key] = data
+    return metadata
+
+
+def iter_archived_rows(archive_dir=ARCHIVE_DIR):
+    """
+    Yield the CSV dict rows of every archived month, oldest month first.
+    """
+    for path in archived_months(archive_dir).values():
+        yield from iter_csv(path)
+
+
+def check_month(value):
+    """
+    Return value if it is a 'YYYY-MM' month, otherwise raise ValueError.
+    Months are compared as strings, so other spellings (e.g. '2025-1') are rejected too.
+    """
+    try:
+        if datetime.strptime(value, "%Y-%m").strftime("%Y-%m") == value:
+            return value
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid month: {value}. Use YYYY-MM.")
+
+
+def archive_closed_months(csv_path, before_month, archive_dir=ARCHIVE_DIR, compression=".xz"):
+    """
+    Move every row dated before before_month ('YYYY-MM') from csv_path into compressed
+    per-month archive files, merging with any existing archive for that month.
+    A '.meta.json' file with the month's count, total, and amount sketches is written next to each archive.
+    Returns a dictionary mapping 'YYYY-MM' → number of rows archived.
+    """
+    check_month(before_month)
+    if compression not in COMPRESSORS:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    existing = archived_months(archive_dir)
+    counts = {}
+
+    with write_lock(csv_path), ExitStack() as locks:
+        # Pass 1: collect the rows of each closed month from the live file.
+        closed = {}
+        for row in iter_csv(csv_path):
+            month_key = row["date"][:7]
+            if month_key < before_month:
+                closed.setdefault(month_key, []).append({name: row.get(name, "") for name in FIELDNAMES})
+                counts[month_key] = counts.get(month_key, 0) + 1
+
+        # Each month is written to its own temporary file and closed before the next one,
+        # so only one month is in memory at a time; the archives replace their targets together
+        # once every month is written. Only the (small) lock files stay open until then.
+        staged = []
+        summaries = []
+        try:
+            for month_key in sorted(closed):
+                rows = closed.pop(month_key)
+                target = existing.get(month_key) or archive_path(archive_dir, month_key, compression)
+                locks.enter_context(write_lock(target))
+
+                # Keep the rows that were archived earlier for the same month, and write the
+                # month in date order so archives can be streamed by date (e.g. for reconciliation).
+                if month_key in existing:
+                    rows = list(iter_csv(existing[month_key])) + rows
+                rows.sort(key=lambda row: row["date"])
+
+                summary = PartitionSummary()
+                with staged_output(target, staged) as f:
+                    writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+                    writer.writeheader()
+                    for row in rows:
+                        writer.writerow(row)
+                        summary.add(row["category"], float(row["amount"]))
+                summaries.append((target, summary))
+            commit_staged(staged)
+        except BaseException:
+            discard_staged(staged)
+            raise
+
+        for target, summary in summaries:
+            _save_metadata(target, summary)
+
+        # Pass 2: rewrite the live file without the archived rows, only after the archives are committed.
+        if counts:
+            write_csv_atomic(csv_path, (row for row in iter_csv(csv_path) if row["date"][:7] >= before_month))
+
+    return counts
+
+
+def parse_date(value):
+    """
+    argparse type for YYYY-MM-DD dates.
+    """
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date: {value}. Use YYYY-MM-DD.")
+
+
+def parse_month(value):
+    """
+    argparse type for YYYY-MM months.
+    """
+    try:
+        return check_month(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or archive Ledger Shredder data")
+    parser.add_argument("--file", default="data/expenses.csv", help="Live CSV file")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Stream transactions to a file or stdout")
+    export_parser.add_argument("output", help="Output path (.csv/.jsonl, optionally .gz/.xz), or '-' for stdout")
+    export_parser.add_argument("--format", choices=FORMATS, default="csv", help="Format when writing to stdout")
+    export_parser.add_argument("--start", type=parse_date)
+    export_parser.add_argument("--end", type=parse_date)
+    export_parser.add_argument("--category")
+    export_parser.add_argument("--include-archive", action="store_true", help="Also export archived months")
+
+    archive_parser = commands.add_parser("archive", help="Move closed months into compressed archives")
+    archive_parser.add_argument("--before", required=True, type=parse_month, help="First month to keep live (YYYY-MM)")
+    archive_parser.add_argument("--compression", choices=sorted(COMPRESSORS), default=".xz")
+
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        counts = archive_closed_months(args.file, args.before, args.archive_dir, args.compression)
+        for month_key, count in sorted(counts.items()):
+            print(f"{month_key}: archived {count} transactions")
+        return
+
+    transactions = iter_transactions(args.file)
+    if args.include_archive:
+        archived = (row_to_transaction(row) for row in iter_archived_rows(args.archive_dir))
+        transactions = itertools.chain(archived, transactions)
+
+    if args.output == "-":
+        selected = filter_transactions(transactions, args.start, args.end, args.category)
+        try:
+            write_transactions(selected, sys.stdout, args.format, flush=True)
+        except BrokenPipeError:
+            # The reader (e.g. `head`) stopped early; that is not an error.
+            # Point stdout at devnull so the final flush at exit does not fail again.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    else:
+        count = export_transactions(transactions, args.output, args.start, args.end, args.category)
+        print(f"Exported {count} transactions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Loading and saving a Ledger's data: the live CSV file, the archived months, budgets, and recurring rules.
+Both the interactive program and the API server go through LedgerFiles, so archived months
+are always loaded back transparently and only rewritten when one of their transactions changed.
+Saves merge this process's changes into the files as they are at save time (see TrackedCSV),
+so two programs editing the same data do not overwrite each other's changes.
+"""
+from pathlib import Path
+from data_io.export import ARCHIVE_DIR, archived_months, save_partition_metadata
+from data_io.storage import (
+    PROGRESS_STEP,
+    RULE_FIELDNAMES,
+    TrackedCSV,
+    iter_csv,
+    load_budgets,
+    save_budgets,
+    row_to_rule,
+    row_to_transaction,
+    rule_to_row,
+    write_lock,
+)
+
+
+class LedgerFiles:
+    """
+    The saved data of one ledger: a live CSV file, a directory of archived months,
+    and the budgets.csv and recurring.csv files stored next to the live file.
+    """
+
+    def __init__(self, filepath="data/expenses.csv", archive_dir=ARCHIVE_DIR):
+        """
+        Describe the files of a ledger. Nothing is read until one of the load methods is called.
+        """
+        self.filepath = filepath
+        self.archive_dir = archive_dir
+        self.budgets_path = Path(filepath).with_name("budgets.csv")
+        self.rules_path = Path(filepath).with_name("recurring.csv")
+
+        # Change counters of the archived months when they were loaded,
+        # so save() can tell which archives changed. Archives that were not loaded are never written.
+        self.archive_versions = {}
+
+        # One TrackedCSV per transaction file (live file and archives), by path.
+        self._tracked = {}
+        self._rules = TrackedCSV(self.rules_path, RULE_FIELDNAMES, row_to_rule, rule_to_row,
+                                 sort_key=lambda row: row["id"])
+        # Budget limits as loaded (or last saved); limits set since then are merged into the file.
+        self._budget_base = {}
+
+
+    def _file(self, path):
+        """
+        Return the TrackedCSV for a transaction file.
+        """
+        return self._tracked.setdefault(str(path), TrackedCSV(path))
+
+
+    def load(self, ledger, progress=None):
+        """
+        Add every saved transaction (archived months and the live file) to the ledger in date order.
+        progress(loaded, total) is called while the files are read (with total None)
+        and then as transactions are added. Returns the number of transactions added.
+        """
+        archives = archived_months(self.archive_dir)
+        transactions = []
+        for path in list(archives.values()) + [self.filepath]:
+            read = len(transactions)
+            transactions.extend(self._file(path).load(
+                None if progress is None else lambda count: progress(read + count, None)
+            ))
+        transactions.sort()
+
+        for count, transaction in enumerate(transactions, start=1):
+            ledger.add(transaction)
+            if progress is not None and count % PROGRESS_STEP == 0:
+                progress(count, len(transactions))
+
+        if progress is not None:
+            progress(len(transactions), len(transactions))
+
+        self.archive_versions = {month_key: ledger.month_version(month_key) for month_key in archives}
+        return len(transactions)
+
+
+    def save(self, ledger):
+        """
+        Save the ledger's transactions back to the live file and the archived months.
+        Transactions in an archived month go back to its archive file, which is only rewritten if that month changed.
+        Months another program archived since the ledger was loaded are picked up too, so this program's
+        edits and removals of their transactions go to the archive instead of back into the live file.
+        """
+        # The live file's lock is held throughout, so archiving (which holds it too) cannot run in between.
+        with write_lock(self.filepath):
+            live_file = self._file(self.filepath)
+            archives = archived_months(self.archive_dir)
+            changed = set()
+            for month_key, path in archives.items():
+                if month_key in self.archive_versions:
+                    if ledger.month_version(month_key) != self.archive_versions[month_key]:
+                        changed.add(month_key)
+                elif self._file(path).adopt(live_file, iter_csv(path)):
+                    changed.add(month_key)
+
+            live = []
+            archived = {}
+            for transaction in ledger:
+                month_key = transaction.date.strftime("%Y-%m")
+                if month_key in archives:
+                    archived.setdefault(month_key, []).append(transaction)
+                    if month_key not in self.archive_versions:
+                        changed.add(month_key)
+                else:
+                    live.append(transaction)
+
+            # IDs are shared by the live file and the archives (archiving moves rows with their IDs):
+            # a transaction an edit moves from one file to another keeps its ID, and new transactions
+            # get IDs after every ID in any of them, so same-day transactions load back in the same order.
+            ids = {}
+            for path in [self.filepath, *archives.values()]:
+                ids.update(self._file(path).ids())
+
+            def save_file(path, transactions, lock=True):
+                tracked = self._file(path)
+                rows = tracked.save(transactions, ids, max(ids.values(), default=0) + 1, lock)
+                ids.update(tracked.ids())
+                return rows
+
+            # The files are written in date order so they can be streamed by date (e.g. for reconciliation).
+            save_file(self.filepath, live, lock=False)
+
+            for month_key in sorted(changed):
+                path = archives[month_key]
+                rows = save_file(path, archived.get(month_key, []))
+                save_partition_metadata(path, [row_to_transaction(row) for row in rows])
+                self.archive_versions[month_key] = ledger.month_version(month_key)
+
+
+    def load_budgets(self, ledger):
+        """
+        Set the ledger's budget limits from budgets.csv.
+        """
+        limits = load_budgets(self.budgets_path)
+        ledger.budget.limits.update(limits)
+        self._budget_base = limits
+
+
+    def save_budgets(self, ledger):
+        """
+        Save the ledger's budget limits, keeping limits other writers changed since they were loaded.
+        """
+        limits = dict(ledger.budget.limits)
+        save_budgets(self.budgets_path, limits, self._budget_base)
+        self._budget_base = limits
+
+
+    def load_rules(self, ledger):
+        """
+        Add the recurring rules from recurring.csv to the ledger.
+        """
+        for rule in self._rules.load():
+            ledger.add_rule(rule)
+
+
+    def save_rules(self, ledger):
+        """
+        Save the ledger's recurring rules, keeping rules other writers added or changed since they were loaded.
+        """
+        self._rules.save(ledger.rules)
@@ -0,0 +1,147 @@
+"""
+Background loading of saved data, so the menu can be shown before a large ledger has been read.
+The loader fills its own Ledger on a worker thread; the main thread only takes it over once
+loading has finished, so the Ledger is never used by two threads at once.
+"""
+import threading
+from models.budget import BudgetTracker
+from models.ledger import Ledger
+from models.transaction import Transaction
+
+class BackgroundLoader:
+    """
+    Runs load(ledger, report, progress) on a background thread into a fresh Ledger.
+    """
+
+    def __init__(self, load):
+        """
+        Prepare a loader for the given load function. Call start() to begin.
+        load receives the Ledger to fill, a report(message, color) function for status messages,
+        and a progress(loaded, total) function; its return value is kept in result.
+        """
+        self.ledger = Ledger()
+        self.loaded = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        # (message, color) pairs reported while loading, shown once loading has finished.
+        self.messages = []
+
+        self._load = load
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+
+    def start(self):
+        """
+        Start loading in the background and return self.
+        """
+        self._thread.start()
+        return self
+
+
+    def _run(self):
+        """
+        Thread body: run the load function and record its result or error.
+        """
+        try:
+            self.result = self._load(self.ledger, self._report, self._progress)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+
+    def _report(self, message, color="info"):
+        """
+        Record a status message from the load function.
+        """
+        self.messages.append((message, color))
+
+
+    def _progress(self, loaded, total=None):
+        """
+        Record how many transactions have been loaded so far (total is None while the files are still being read).
+        """
+        self.loaded = loaded
+        self.total = total
+
+
+    @property
+    def done(self):
+        """
+        True once loading has finished (successfully or not).
+        """
+        return self._done.is_set()
+
+
+    def wait(self, timeout=None):
+        """
+        Wait until loading has finished or timeout seconds have passed. Returns done.
+        """
+        return self._done.wait(timeout)
+
+
+    def status(self):
+        """
+        Return a short progress message, e.g. 'Loading saved data... 5000/20000 transactions'.
+        """
+        if self.done:
+            failures = [message for message, color in self.messages if color == "red"]
+            if self.error is not None:
+                failures.append(f"Failed to load data: {self.error}")
+            return failures[-1] if failures else f"Loaded {len(self.ledger)} transactions."
+        if self.total:
+            return f"Loading saved data... {self.loaded}/{self.total} transactions"
+        if self.loaded:
+            return f"Reading saved data... {self.loaded} transactions"
+        return "Loading saved data..."
+
+
+class PendingLedger:
+    """
+    Stands in for the Ledger while it is still loading.
+    New transactions are queued here and get their IDs once they are added to the loaded ledger.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty queue.
+        """
+        self.queued = []
+        # No budgets are known yet, so budget checks find nothing to warn about;
+        # queued transactions are checked again once they are added to the loaded ledger.
+        self.budget = BudgetTracker()
+
+
+    def add(self, transaction):
+        """
+        Queue a Transaction to be added once loading has finished.
+        """
+        if not isinstance(transaction, Transaction):
+            raise TypeError("Ledger can only store Transaction objects")
+        self.queued.append(transaction)
+
+
+    def drain_into(self, ledger):
+        """
+        Add all queued transactions to the loaded ledger (assigning their IDs) and return them.
+        """
+        queued, self.queued = self.queued, []
+        for transaction in queued:
+            ledger.add(transaction)
+        return queued
+
+
+    def __len__(self):
+        """
+        Return the number of queued transactions.
+        """
+        return len(self.queued)
+
+
+    def __iter__(self):
+        """
+        Allow iteration over the queued transactions.
+        """
+        return iter(self.queued)
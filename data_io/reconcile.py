@@ -0,0 +1,178 @@
+"""
+Reconciliation of an external bank statement against the ledger using a sorted merge.
+Both inputs are streamed once in date order; only entries within the date tolerance
+window are held in memory while looking for their match.
+
+Run with:
+    python3 -m data_io.reconcile statement.csv --days 2
+"""
+import argparse
+import heapq
+import itertools
+from collections import deque
+from datetime import date, timedelta
+from pathlib import Path
+from data_io.export import ARCHIVE_DIR, iter_archived_rows
+from data_io.storage import iter_csv, iter_transactions, load_rules, row_to_transaction
+from models.transaction import Transaction
+
+MATCHED = "matched"
+MISSING_IN_LEDGER = "missing_in_ledger"
+MISSING_IN_STATEMENT = "missing_in_statement"
+
+DEFAULT_CATEGORY = "Uncategorized"
+
+
+def iter_statement(path, default_category=DEFAULT_CATEGORY):
+    """
+    Yield Transaction objects from a bank statement CSV, one row at a time.
+    Required columns: date, amount. Optional: category, note (or description).
+    Only debits (negative amounts) are expenses; credits such as deposits, salary and refunds are skipped.
+    """
+    for row in iter_csv(path):
+        amount = float(row["amount"])
+        if amount >= 0:
+            continue
+        yield Transaction(
+            amount=-amount,
+            category=(row.get("category") or "").strip() or default_category,
+            date_str=row["date"].strip(),
+            note=row.get("note") or row.get("description") or "",
+        )
+
+
+def _in_date_order(transactions, source):
+    """
+    Yield transactions, raising ValueError if a date goes backwards.
+    """
+    last_date = None
+    for transaction in transactions:
+        if last_date is not None and transaction.date < last_date:
+            raise ValueError(
+                f"{source} is not sorted by date ({transaction.date} after {last_date}); "
+                "sort it before reconciling."
+            )
+        last_date = transaction.date
+        yield transaction
+
+
+def _cents(transaction):
+    """
+    Return the amount in whole cents, so float amounts compare exactly.
+    """
+    return round(transaction.amount * 100)
+
+
+def reconcile(statement, ledger_entries, days=0, rules=()):
+    """
+    Join two date-sorted streams of transactions and yield (status, statement_entry, ledger_entry).
+    Entries match when their amounts are equal and their dates are at most days apart;
+    status is MATCHED, MISSING_IN_LEDGER (ledger_entry is None) or MISSING_IN_STATEMENT (statement_entry is None).
+    Only ledger entries within the statement's period (± days) are compared: earlier ones are skipped,
+    and the ledger is not read past the end of the statement.
+    The occurrences of the recurring rules in that period (up to today) are merged into the ledger side,
+    as in the ledger's date-filtered views.
+    """
+    statement = _in_date_order(statement, "Statement")
+    ledger_entries = _in_date_order(ledger_entries, "Ledger")
+
+    first = next(statement, None)
+    if first is None:
+        return
+    if rules:
+        # Each rule yields its occurrences lazily in date order, so they merge without being collected.
+        start_date = first.date - timedelta(days=days)
+        occurrences = [rule.occurrences(start_date, date.today()) for rule in rules]
+        ledger_entries = heapq.merge(ledger_entries, *occurrences, key=lambda t: t.date)
+    ledger_entries = itertools.dropwhile(lambda t: (first.date - t.date).days > days, ledger_entries)
+    last_date = first.date
+
+    # Unmatched entries that could still match something later in the other stream.
+    windows = {"statement": deque(), "ledger": deque()}
+    next_items = {"statement": first, "ledger": next(ledger_entries, None)}
+    sources = {"statement": statement, "ledger": ledger_entries}
+
+    def unmatched(side, transaction):
+        if side == "statement":
+            return (MISSING_IN_LEDGER, transaction, None)
+        return (MISSING_IN_STATEMENT, None, transaction)
+
+    while next_items["statement"] is not None or next_items["ledger"] is not None:
+        # Once the statement is used up, later ledger entries are outside its period.
+        if next_items["statement"] is None and (next_items["ledger"].date - last_date).days > days:
+            break
+
+        # Take the earlier of the two heads so the merged sequence is in date order.
+        if next_items["ledger"] is None or (
+            next_items["statement"] is not None and next_items["statement"].date <= next_items["ledger"].date
+        ):
+            side, other = "statement", "ledger"
+        else:
+            side, other = "ledger", "statement"
+
+        transaction = next_items[side]
+        next_items[side] = next(sources[side], None)
+        if side == "statement":
+            last_date = transaction.date
+
+        # Anything older than the tolerance can no longer match; report it.
+        for window_side in (side, other):
+            window = windows[window_side]
+            while window and (transaction.date - window[0].date).days > days:
+                yield unmatched(window_side, window.popleft())
+
+        # Match against the closest-dated entry of the same amount in the other window.
+        cents = _cents(transaction)
+        match = None
+        for candidate in windows[other]:
+            if _cents(candidate) == cents:
+                if match is None or abs((candidate.date - transaction.date).days) < abs((match.date - transaction.date).days):
+                    match = candidate
+
+        if match is None:
+            windows[side].append(transaction)
+            continue
+
+        windows[other].remove(match)
+        if side == "statement":
+            yield (MATCHED, transaction, match)
+        else:
+            yield (MATCHED, match, transaction)
+
+    for window_side in ("statement", "ledger"):
+        for transaction in windows[window_side]:
+            yield unmatched(window_side, transaction)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile a bank statement CSV against the ledger")
+    parser.add_argument("statement", help="Statement CSV (date, amount, optional category/note)")
+    parser.add_argument("--file", default="data/expenses.csv", help="Ledger CSV, sorted by date")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Archived months, read before the ledger CSV")
+    parser.add_argument("--days", type=int, default=0, help="Date tolerance in days")
+    args = parser.parse_args()
+
+    # Archived months are older than everything in the live file, so chaining keeps date order.
+    ledger_entries = itertools.chain(
+        (row_to_transaction(row) for row in iter_archived_rows(args.archive_dir)),
+        iter_transactions(args.file),
+    )
+
+    # Recurring rules are stored next to the ledger CSV, as the program saves them.
+    rules = load_rules(Path(args.file).with_name("recurring.csv"))
+
+    counts = {MATCHED: 0, MISSING_IN_LEDGER: 0, MISSING_IN_STATEMENT: 0}
+    for status, statement_entry, ledger_entry in reconcile(iter_statement(args.statement), ledger_entries, args.days, rules):
+        counts[status] += 1
+        if status == MISSING_IN_LEDGER:
+            print(f"missing in ledger:    {statement_entry.date} {statement_entry.amount:.2f} {statement_entry.note}")
+        elif status == MISSING_IN_STATEMENT:
+            label = f"ID {ledger_entry._id}" if ledger_entry.rule_id is None else f"recurring rule {ledger_entry.rule_id}"
+            print(f"missing in statement: {ledger_entry.date} {ledger_entry.amount:.2f} {ledger_entry.category} ({label})")
+
+    print(f"Matched {counts[MATCHED]}, missing in ledger {counts[MISSING_IN_LEDGER]}, "
+          f"missing in statement {counts[MISSING_IN_STATEMENT]}.")
+
+
+if __name__ == "__main__":
+    main()
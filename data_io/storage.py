@@ -1,77 +1,515 @@
 """
 CSV storage utilities for loading and saving transaction data.
+Writes go to a temporary file that atomically replaces the target, so readers always
+see either the old or the new file in full. Writers are serialized with an advisory
+lock on a sidecar ".lock" file; readers never take the lock and never block.
+Programs that keep data in memory between load and save (the menu, the API server) save
+with a read-modify-write under that lock (TrackedCSV, save_budgets with a base), so
+concurrent writers merge their changes instead of overwriting each other's.
 """
 import csv
+import gzip
+import lzma
+import itertools
+import os
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
 from models.transaction import Transaction
+from models.recurring import RecurringRule
 
-def load_csv(path):
+try:
+    import fcntl
+except ImportError:
+    # fcntl is POSIX-only; on other platforms writes stay atomic but are not locked.
+    fcntl = None
+
+FIELDNAMES = ["id", "amount", "category", "date", "note"]
+BUDGET_FIELDNAMES = ["category", "limit"]
+
+# How often (in rows) long loads report progress.
+PROGRESS_STEP = 10000
+RULE_FIELDNAMES = ["id", "amount", "category", "start", "end", "frequency", "interval", "note", "materialized_through"]
+
+# os.umask can only be read by setting it, so read it once at import time.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# File suffixes that are transparently (de)compressed by open_text.
+COMPRESSORS = {
+    ".gz": gzip.open,
+    ".xz": lzma.open,
+}
+
+
+def open_text(path, mode="r", compression_path=None):
     """
-    Read a CSV file and return a list of dict rows. Return empty list if missing.
+    Open a text file for reading or writing, decompressing/compressing by suffix (.gz, .xz).
+    compression_path selects the compression by another name (e.g. the final name of a temp file).
+    """
+    opener = COMPRESSORS.get(Path(compression_path or path).suffix)
+    if opener is not None:
+        return opener(path, mode + "t", newline="", encoding="utf-8")
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+@contextmanager
+def write_lock(path):
+    """
+    Hold an exclusive advisory lock for writing to path.
+    Use it around a read-modify-write sequence so concurrent writers cannot clobber each other.
+    """
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with lock_path.open("a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def iter_csv(path):
+    """
+    Yield dict rows from a CSV file one at a time (nothing if the file is missing).
+    Compressed files (.gz, .xz) are decompressed transparently.
+    The file is opened once, so the rows come from a single consistent snapshot
+    even if a writer replaces the file while it is being read.
     """
-    rows = []
     try:
         p = Path(path)
         if not p.exists():
-            return []
+            return
 
-        with p.open(newline="", encoding="utf-8") as f:
+        with open_text(p) as f:
             reader = csv.DictReader(f)
             for row in reader:
-                rows.append(row)
+                yield row
 
-    except (OSError, csv.Error) as e:
+    except (OSError, EOFError, lzma.LZMAError, csv.Error) as e:
         raise RuntimeError(f"Failed to read CSV: {e}")
 
-    else:
-        return rows
-    
-def rows_to_transactions(rows):
+
+def load_csv(path):
+    """
+    Read a CSV file and return a list of dict rows. Return empty list if missing.
+    """
+    return list(iter_csv(path))
+
+
+def row_to_transaction(row):
+    """
+    Convert a single CSV dict row to a Transaction object.
+    """
+    return Transaction(
+        amount=float(row["amount"]),
+        category=row["category"],
+        date_str=row["date"],
+        note=row.get("note", ""),
+        # Use existing ID if present.
+        _id=int(row["id"]) if row.get("id") else None,
+    )
+
+
+def iter_transactions(path):
+    """
+    Yield Transaction objects from a CSV file in file order, without loading it all into memory.
+    """
+    for row in iter_csv(path):
+        yield row_to_transaction(row)
+
+
+def rows_to_transactions(rows, dedup=None, policy="reject"):
     """
     Convert CSV dict rows to Transaction objects.
+    If dedup (a DuplicateIndex) is given, duplicates are handled according to policy
+    ("reject", "merge" or "report") and recorded in dedup.duplicates.
     """
     transactions = []
 
     for row in rows:
-        transaction = Transaction(
-            amount=float(row["amount"]),
-            category=row["category"],
-            date_str=row["date"],
-            note=row.get("note", ""),
-            # Use existing ID if present.
-            _id=int(row["id"]) if row.get("id") else None,
-        )
-        transactions.append(transaction)
+        transaction = row_to_transaction(row)
+        if dedup is None or dedup.check(transaction, policy):
+            transactions.append(transaction)
 
     # Sort by date.
     transactions.sort()
     return transactions
 
+def transaction_to_row(transaction):
+    """
+    Convert a single Transaction object into a dict row for CSV writing.
+    """
+    return {
+        "id": transaction._id,
+        "amount": transaction.amount,
+        "category": transaction.category,
+        "date": transaction.date.isoformat(),
+        "note": transaction.note,
+    }
+
+
 def transactions_to_rows(transactions):
     """
     Convert Transaction objects into dict rows for CSV writing.
     """
-    return [
-        {
-            "id": transaction._id,
-            "amount": transaction.amount,
-            "category": transaction.category,
-            "date": transaction.date.isoformat(),
-            "note": transaction.note,
-        }
-        for transaction in transactions
-    ]
+    return [transaction_to_row(transaction) for transaction in transactions]
 
-def save_csv(path, rows):
+@contextmanager
+def staged_output(path, staged):
     """
-    Write dict rows into a CSV file.
+    Yield a text stream for a temporary file next to path. On success the finished file is left
+    in place and (temporary path, path) is appended to staged, for commit_staged to rename over path;
+    on failure it is removed. Compression is chosen from the suffix of path.
     """
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
 
-    fieldnames = ["id", "amount", "category", "date", "note"]
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{p.name}.", suffix=".tmp", dir=p.parent)
+    os.close(fd)
+    try:
+        with open_text(tmp_name, "w", compression_path=p) as f:
+            yield f
+
+        # Make sure the data is on disk before the rename makes it visible.
+        with open(tmp_name, "rb") as f:
+            os.fsync(f.fileno())
+
+        # mkstemp creates the file as 0600; keep the permissions of the file being replaced,
+        # or use the normal default for a new file.
+        if p.exists():
+            os.chmod(tmp_name, p.stat().st_mode & 0o777)
+        else:
+            os.chmod(tmp_name, 0o666 & ~_UMASK)
+    except BaseException:
+        # Never leave a half-written temporary file behind.
+        discard_staged([(tmp_name, p)])
+        raise
+    staged.append((tmp_name, p))
+
+
+def commit_staged(staged):
+    """
+    Rename every staged temporary file over its target. The caller must hold the targets' write locks.
+    """
+    for tmp_name, path in staged:
+        os.replace(tmp_name, path)
+
+
+def discard_staged(staged):
+    """
+    Remove staged temporary files that were not committed.
+    """
+    for tmp_name, _ in staged:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
 
-    with p.open("w", newline="", encoding="utf-8") as f:
+
+@contextmanager
+def atomic_output(path):
+    """
+    Yield a text stream for a temporary file next to path; on success, rename it over path.
+    Compression is chosen from the suffix of path. The caller must hold the write lock.
+    """
+    staged = []
+    with staged_output(path, staged) as f:
+        yield f
+    try:
+        commit_staged(staged)
+    except BaseException:
+        discard_staged(staged)
+        raise
+
+
+def write_csv_atomic(path, rows, fieldnames=FIELDNAMES):
+    """
+    Write rows to a temporary file next to path, then rename it over path.
+    The caller must hold the write lock.
+    """
+    with atomic_output(path) as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(rows)
+
+
+def save_csv(path, rows, fieldnames=FIELDNAMES):
+    """
+    Write dict rows into a CSV file.
+    The file is replaced atomically while holding the write lock.
+    """
+    with write_lock(path):
+        write_csv_atomic(path, rows, fieldnames)
+
+
+def update_csv(path, update, fieldnames=FIELDNAMES):
+    """
+    Apply update(rows) → new rows to the CSV file under a single write lock.
+    Use this for read-modify-write jobs so changes from other writers are not lost.
+    """
+    with write_lock(path):
+        rows = load_csv(path)
+        write_csv_atomic(path, update(rows), fieldnames)
+
+
+def _normalize(value):
+    """
+    Return a field value in a form that compares equal whether it was read from a CSV file
+    (always a string) or comes from an object (e.g. 10.0, None).
+    """
+    if value is None:
+        return ""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _row_keys(ids):
+    """
+    Return a merge key for each row ID: the integer ID, or ("row", position) if the ID is missing or repeated.
+    """
+    counts = Counter(ids)
+    keys = []
+    for position, value in enumerate(ids):
+        value = str(value or "")
+        if value.isdigit() and counts[value] == 1:
+            keys.append(int(value))
+        else:
+            keys.append(("row", position))
+    return keys
+
+
+class TrackedCSV:
+    """
+    A CSV file of records with an "id" column that is loaded once and saved with a three-way merge.
+    It remembers which row each loaded object came from and what that row contained, so save()
+    applies only this process's additions, changes, and removals to the file as it is at save time.
+    Changes other writers made in the meantime are kept; if both changed the same row, the last save wins.
+    """
+
+    def __init__(self, path, fieldnames=FIELDNAMES, from_row=None, to_row=None, sort_key=None):
+        """
+        Describe a tracked file. from_row/to_row convert between rows and objects
+        (Transactions by default); sort_key orders the saved rows (date, then ID by default).
+        """
+        self.path = path
+        self.fieldnames = fieldnames
+        self.from_row = from_row or row_to_transaction
+        self.to_row = to_row or transaction_to_row
+        self.sort_key = sort_key or (lambda row: (str(row["date"]), row["id"]))
+
+        # Merge key → content of each row as this process last loaded or saved it,
+        # and loaded object → merge key of its row. Objects are keyed by identity.
+        self._base = {}
+        self._origins = {}
+
+
+    def _content(self, row):
+        """
+        Return the comparable content of a row (every field except the ID).
+        """
+        return tuple(_normalize(row.get(name)) for name in self.fieldnames if name != "id")
+
+
+    def load(self, progress=None):
+        """
+        Read the file and return one object per row (an empty list if it is missing).
+        Rows are converted as they are read; progress(count) is called every PROGRESS_STEP rows.
+        """
+        ids = []
+        contents = []
+        objects = []
+        for count, row in enumerate(iter_csv(self.path), start=1):
+            ids.append(row.get("id"))
+            contents.append(self._content(row))
+            objects.append(self.from_row(row))
+            if progress is not None and count % PROGRESS_STEP == 0:
+                progress(count)
+
+        self._base = dict(zip(_row_keys(ids), contents))
+        self._origins = dict(zip(objects, _row_keys(ids)))
+        return objects
+
+
+    def ids(self):
+        """
+        Return loaded (or saved) object → its ID in the file, for every object whose row has a usable ID.
+        """
+        return {obj: key for obj, key in self._origins.items() if isinstance(key, int)}
+
+
+    def adopt(self, other, rows):
+        """
+        Take over from other (the TrackedCSV of another file) the rows that were moved from it into this file,
+        given this file's current rows, so this process's edits and removals of them are applied here.
+        """
+        moved = {key for key in _row_keys([row.get("id") for row in rows])
+                 if isinstance(key, int) and key in other._base}
+        for key in moved:
+            self._base[key] = other._base.pop(key)
+        for obj, key in list(other._origins.items()):
+            if key in moved:
+                self._origins[obj] = other._origins.pop(obj)
+        return len(moved)
+
+
+    def save(self, objects, ids=None, first_id=1, lock=True):
+        """
+        Merge objects (this process's current records) into the file under the write lock and
+        replace it atomically. Returns the rows that were written.
+        Objects new to this file keep the ID ids maps them to (e.g. when they moved here from another file)
+        if it is free; other new rows get IDs from first_id on, after every ID in use.
+        Pass lock=False if the caller already holds the file's write lock.
+        """
+        written = []
+
+        def merge(rows):
+            written.extend(self._merge(rows, objects, ids or {}, first_id))
+            return written
+
+        if lock:
+            update_csv(self.path, merge, self.fieldnames)
+        else:
+            write_csv_atomic(self.path, merge(load_csv(self.path)), self.fieldnames)
+        return written
+
+
+    def _merge(self, rows, objects, ids, first_id):
+        """
+        Apply the changes between the remembered base and objects to the current rows of the file.
+        """
+        current = dict(zip(_row_keys([row.get("id") for row in rows]), rows))
+
+        ours = {}
+        new = []
+        removed = {}
+        for obj in objects:
+            key = self._origins.get(obj)
+            if key in self._base:
+                ours[key] = obj
+            elif key is None:
+                new.append(obj)
+            else:
+                # Its row was removed from the file by another writer; it stays out of the file.
+                removed[obj] = key
+
+        # Rows removed here are removed from the file; rows changed here overwrite the file's version.
+        # Rows another writer removed (or moved to another file) are not written back, even if changed here,
+        # and rows left alone here keep whatever other writers did to them.
+        for key in self._base.keys() - ours.keys():
+            current.pop(key, None)
+        for key, obj in list(ours.items()):
+            row = self.to_row(obj)
+            if key not in current:
+                removed[ours.pop(key)] = ("removed", key)
+            elif self._content(row) != self._base[key]:
+                current[key] = row
+
+        # New objects keep their given ID if it is free; the others, and rows without
+        # a usable ID, get IDs after every ID in use.
+        used = {key for key in itertools.chain(current, self._base) if isinstance(key, int)}
+        new_ids = {}
+        for obj in new:
+            file_id = ids.get(obj)
+            if file_id is not None and file_id not in used:
+                new_ids[obj] = file_id
+                used.add(file_id)
+        next_id = itertools.count(max(max(used, default=0) + 1, first_id))
+        file_ids = {key: key if isinstance(key, int) else next(next_id) for key in current}
+
+        merged = [dict(row, id=file_ids[key]) for key, row in current.items()]
+        self._base = {}
+        self._origins = dict(removed)
+        for key, obj in ours.items():
+            file_id = file_ids[key]
+            self._base[file_id] = self._content(self.to_row(obj))
+            self._origins[obj] = file_id
+        for obj in new:
+            row = dict(self.to_row(obj), id=new_ids[obj] if obj in new_ids else next(next_id))
+            merged.append(row)
+            self._base[row["id"]] = self._content(row)
+            self._origins[obj] = row["id"]
+
+        merged.sort(key=self.sort_key)
+        return merged
+
+
+def load_budgets(path):
+    """
+    Read a budgets CSV (category, limit) and return a dictionary mapping category → monthly limit.
+    """
+    return {row["category"]: float(row["limit"]) for row in iter_csv(path)}
+
+
+def save_budgets(path, limits, base=None):
+    """
+    Write a dictionary of category → monthly limit into a budgets CSV.
+    If base (the limits as they were loaded) is given, only the categories set, changed, or removed
+    since then are applied to the file as it is now, so other writers' changes are kept.
+    """
+    def merge(rows):
+        merged = limits
+        if base is not None:
+            merged = {row["category"]: float(row["limit"]) for row in rows}
+            for category in base.keys() - limits.keys():
+                merged.pop(category, None)
+            for category, limit in limits.items():
+                if base.get(category) != limit:
+                    merged[category] = limit
+        return [{"category": category, "limit": limit} for category, limit in sorted(merged.items())]
+
+    update_csv(path, merge, BUDGET_FIELDNAMES)
+
+
+def row_to_rule(row):
+    """
+    Convert a recurring rules CSV dict row to a RecurringRule object.
+    """
+    return RecurringRule(
+        amount=float(row["amount"]),
+        category=row["category"],
+        start_str=row["start"],
+        end_str=row.get("end") or None,
+        frequency=row.get("frequency") or "monthly",
+        interval=int(row.get("interval") or 1),
+        note=row.get("note", ""),
+        materialized_through=row.get("materialized_through") or None,
+        _id=int(row["id"]) if row.get("id") else None,
+    )
+
+
+def rule_to_row(rule):
+    """
+    Convert a RecurringRule into a dict row for CSV writing.
+    """
+    return {
+        "id": rule._id,
+        "amount": rule.amount,
+        "category": rule.category,
+        "start": rule.start.isoformat(),
+        "end": rule.end.isoformat() if rule.end else "",
+        "frequency": rule.frequency,
+        "interval": rule.interval,
+        "note": rule.note,
+        "materialized_through": rule.materialized_through.isoformat() if rule.materialized_through else "",
+    }
+
+
+def load_rules(path):
+    """
+    Read a recurring rules CSV and return a list of RecurringRule objects.
+    """
+    return [row_to_rule(row) for row in iter_csv(path)]
+
+
+def save_rules(path, rules):
+    """
+    Write RecurringRule objects into a recurring rules CSV.
+    """
+    save_csv(path, [rule_to_row(rule) for rule in rules], fieldnames=RULE_FIELDNAMES)
@@ -2,53 +2,91 @@
 Main entry point for Ledger Shredder.
 Handles program flow, menu navigation, data loading, and saving.
 """
-from data_io.storage import (
-    load_csv,
-    save_csv,
-    rows_to_transactions,
-    transactions_to_rows
-)
-from models.ledger import Ledger
-from ui.messages import print_message
+from data_io.ledger_files import LedgerFiles
+from data_io.loader import BackgroundLoader, PendingLedger
+from ui.messages import format_message, print_message
 from ui.display import clear_screen, pause, show_menu
-from actions.expense_actions import (
-    add_expense,
-    edit_expense,
-    delete_expense,
-    list_all_expenses,
-    list_by_category,
-    list_by_date_range,
-    list_monthly_summary,
-    show_total_amount
-)
-
-def load_data(ledger, filepath = "data/expenses.csv"):
+
+# Menu choices that can run before the saved data has finished loading; every other choice waits for it.
+# Adding an expense only queues it; it gets its ID once loading finishes.
+NO_DATA_CHOICES = {"1"}
+
+def load_data(ledger, files, report = print_message, progress = None):
     """
-    Load CSV data into the ledger.
+    Load the saved data described by files (a LedgerFiles) into the ledger, including archived months.
+    Status messages go to report(message, color); progress(loaded, total) is called as transactions are read and added.
     """
-    print_message("Loading saved data...", "blue")
+    report("Loading saved data...", "blue")
 
     try:
-        rows = load_csv(filepath)
-        transactions = rows_to_transactions(rows)
+        files.load_budgets(ledger)
     except Exception as e:
-        print_message(f"Failed to load data: {e}", "red")
+        report(f"Failed to load budgets: {e}", "red")
+
+    try:
+        files.load_rules(ledger)
+    except Exception as e:
+        report(f"Failed to load recurring expenses: {e}", "red")
+
+    try:
+        files.load(ledger, progress)
+    except Exception as e:
+        report(f"Failed to load data: {e}", "red")
         return
 
-    for transaction in transactions:
-        ledger.add(transaction)
+    report(f"Loaded {len(ledger)} transactions.", "green")
+
 
-    print_message(f"Loaded {len(ledger)} transactions.", "green")
+def start_loading(files):
+    """
+    Start loading saved data on a background thread and return the BackgroundLoader.
+    """
+    return BackgroundLoader(
+        lambda ledger, report, progress: load_data(ledger, files, report, progress)
+    ).start()
 
 
-def save_data(ledger, filepath = "data/expenses.csv"):
+def finish_loading(loader, pending):
     """
-    Save ledger data back into CSV.
+    Wait for the background load to finish (showing progress), then add any queued expenses
+    and check them against the budgets, which were not known when they were queued.
+    Returns the loaded ledger.
+    """
+    from actions.expense_actions import warn_if_over_budget
+
+    waited = False
+    while not loader.wait(0.2):
+        print("\r" + format_message(loader.status(), "blue"), end="", flush=True)
+        waited = True
+    if waited:
+        print()
+
+    if loader.error is not None:
+        print_message(f"Failed to load data: {loader.error}", "red")
+    for message, color in loader.messages:
+        if color != "blue":
+            print_message(message, color)
+
+    ledger = loader.ledger
+    queued = pending.drain_into(ledger)
+    if queued:
+        print_message(f"Added {len(queued)} queued transaction(s).", "green")
+        for transaction in queued:
+            warn_if_over_budget(ledger, transaction)
+
+    return ledger
+
+
+def save_data(ledger, files):
+    """
+    Save ledger data back into CSV: the live file, changed archived months, budgets, and recurring rules.
+    Changes other programs saved to the same files in the meantime are kept.
     """
     print_message("Saving data...", "blue")
 
-    rows = transactions_to_rows(list(ledger))
-    save_csv(filepath, rows)
+    files.save(ledger)
+    files.save_budgets(ledger)
+    files.save_rules(ledger)
 
     print_message("Data saved. Goodbye!", "green")
 
@@ -57,6 +95,24 @@ def handle_menu_choice(choice, ledger):
     """
     Handle a menu selection. Return False to exit the program.
     """
+    # Imported on first use so the action modules load after the menu is already on screen.
+    from actions.expense_actions import (
+        add_expense,
+        edit_expense,
+        delete_expense,
+        list_all_expenses,
+        list_by_category,
+        list_by_date_range,
+        list_monthly_summary,
+        show_total_amount,
+        import_expenses,
+        show_budgets,
+        reconcile_statement,
+        show_spending_stats,
+        list_sorted_expenses,
+        manage_recurring
+    )
+
     if choice == "1":
         add_expense(ledger)
     elif choice == "2":
@@ -73,6 +129,18 @@ def handle_menu_choice(choice, ledger):
         list_monthly_summary(ledger)
     elif choice == "8":
         show_total_amount(ledger)
+    elif choice == "10":
+        import_expenses(ledger)
+    elif choice == "11":
+        show_budgets(ledger)
+    elif choice == "12":
+        reconcile_statement(ledger)
+    elif choice == "13":
+        show_spending_stats(ledger)
+    elif choice == "14":
+        list_sorted_expenses(ledger)
+    elif choice == "15":
+        manage_recurring(ledger)
     elif choice == "9":
         return False
     else:
@@ -83,24 +151,36 @@ def handle_menu_choice(choice, ledger):
 
 
 def main():
-    ledger = Ledger()
-
-    # Load existing data
-    load_data(ledger)
-    pause()
+    # Load existing data in the background while the menu is shown.
+    files = LedgerFiles()
+    loader = start_loading(files)
+    pending = PendingLedger()
+    ledger = None
 
     # Main program loop
     running = True
     while running:
+        if ledger is None and loader.done:
+            # Let the user see what happened to queued expenses before the menu is redrawn.
+            had_queued = len(pending) > 0
+            ledger = finish_loading(loader, pending)
+            if had_queued:
+                pause()
+
         clear_screen()
-        show_menu()
+        show_menu(loader.status())
         choice = input("Select an option: ").strip()
         print()
 
-        running = handle_menu_choice(choice, ledger)
+        # Only wait for the data when the chosen action needs it.
+        if ledger is None and choice not in NO_DATA_CHOICES:
+            ledger = finish_loading(loader, pending)
+            print()
+
+        running = handle_menu_choice(choice, ledger if ledger is not None else pending)
 
     # Save when exit
-    save_data(ledger)
+    save_data(ledger, files)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""
+Defines the BudgetTracker class, which keeps monthly spending limits per category
+and a running total of spending per (month, category).
+The Ledger updates the running totals on every add, update, and remove, so budget checks
+and reports never need to scan the transactions.
+"""
+
+def month_key(date_obj):
+    """
+    Return the 'YYYY-MM' key for a date.
+    """
+    return date_obj.strftime("%Y-%m")
+
+
+class BudgetTracker:
+    """
+    Tracks monthly budget limits per category and running spend per month and category.
+    """
+
+    def __init__(self, limits=None):
+        """
+        Create a tracker with an optional mapping of category → monthly limit.
+        """
+        self.limits = dict(limits or {})
+        # month → {category → amount spent}
+        self._spend = {}
+
+
+    def record(self, date_obj, category, amount):
+        """
+        Add amount (negative to subtract) to the running spend for the month and category.
+        """
+        month = month_key(date_obj)
+        by_category = self._spend.setdefault(month, {})
+        total = by_category.get(category, 0) + amount
+
+        # Drop totals that reach zero (allowing for float rounding) to keep the maps small.
+        if abs(total) < 1e-9:
+            by_category.pop(category, None)
+            if not by_category:
+                del self._spend[month]
+        else:
+            by_category[category] = total
+
+
+    def set_limit(self, category, limit):
+        """
+        Set the monthly limit for a category. A limit of None or <= 0 removes the budget.
+        """
+        if limit is None or limit <= 0:
+            self.limits.pop(category, None)
+        else:
+            self.limits[category] = limit
+
+
+    def spent(self, month, category):
+        """
+        Return the amount spent in a 'YYYY-MM' month for a category.
+        """
+        return self._spend.get(month, {}).get(category, 0)
+
+
+    def is_over(self, month, category):
+        """
+        Return True if the category has a budget and its spend in the month exceeds it.
+        """
+        limit = self.limits.get(category)
+        return limit is not None and self.spent(month, category) > limit
+
+
+    def month_report(self, month):
+        """
+        Return a sorted list of (category, spent, limit) for a 'YYYY-MM' month.
+        Includes every budgeted category and every category with spending; limit is None if unbudgeted.
+        """
+        by_category = self._spend.get(month, {})
+        categories = set(self.limits) | set(by_category)
+        return [
+            (category, by_category.get(category, 0), self.limits.get(category))
+            for category in sorted(categories)
+        ]
@@ -0,0 +1,145 @@
+"""
+Defines the DuplicateIndex class, a hash index used to detect duplicate transactions during import.
+Exact mode matches on normalized (amount, date, category, note).
+Fuzzy mode also matches entries of the same category that are a few days apart and
+within a small amount tolerance, using a grid of hash buckets so each lookup stays O(1).
+"""
+
+# What to do with a duplicate: drop it, fold it into the existing entry, or keep it and only record it.
+POLICIES = ("reject", "merge", "report")
+
+
+def normalize_text(text):
+    """
+    Normalize free text for comparison: trim, collapse whitespace, and ignore case.
+    """
+    return " ".join((text or "").split()).lower()
+
+
+def exact_key(transaction):
+    """
+    Return the hash key used for exact duplicate matching.
+    """
+    return (
+        round(transaction.amount * 100),
+        transaction.date,
+        normalize_text(transaction.category),
+        normalize_text(transaction.note),
+    )
+
+
+def merge_notes(existing_note, new_note):
+    """
+    Return existing_note extended with new_note, unless it already contains it.
+    """
+    if not new_note or normalize_text(new_note) in normalize_text(existing_note):
+        return existing_note
+    return f"{existing_note}; {new_note}" if existing_note else new_note
+
+
+class DuplicateIndex:
+    """
+    Hash index of known transactions for O(1) duplicate lookups.
+    Duplicates found through check() are recorded in the duplicates list as (new, existing) pairs.
+    """
+
+    def __init__(self, transactions=(), days=0, amount_tolerance=0.0):
+        """
+        Build an index over the given transactions.
+        days and amount_tolerance enable fuzzy matching (notes are ignored in fuzzy mode).
+        """
+        if days < 0 or amount_tolerance < 0:
+            raise ValueError("days and amount_tolerance must be >= 0")
+
+        self.days = int(days)
+        self.tolerance_cents = round(amount_tolerance * 100)
+        self.duplicates = []
+        self._exact = {}
+        self._grid = {}
+
+        for transaction in transactions:
+            self.add(transaction)
+
+
+    @property
+    def fuzzy(self):
+        """
+        True when entries that are not exactly equal may still match.
+        """
+        return self.days > 0 or self.tolerance_cents > 0
+
+
+    def _cell(self, transaction):
+        """
+        Return the grid bucket for fuzzy matching.
+        Buckets are one tolerance wide, so any match lies in the same or an adjacent bucket.
+        """
+        return (
+            normalize_text(transaction.category),
+            transaction.date.toordinal() // (self.days + 1),
+            round(transaction.amount * 100) // (self.tolerance_cents + 1),
+        )
+
+
+    def add(self, transaction):
+        """
+        Add a transaction to the index.
+        """
+        self._exact.setdefault(exact_key(transaction), transaction)
+
+        if self.fuzzy:
+            self._grid.setdefault(self._cell(transaction), []).append(transaction)
+
+
+    def find(self, transaction):
+        """
+        Return an indexed transaction that duplicates the given one, or None.
+        In fuzzy mode the closest match (by days, then amount) is returned.
+        """
+        match = self._exact.get(exact_key(transaction))
+        if match is not None or not self.fuzzy:
+            return match
+
+        category, day_cell, amount_cell = self._cell(transaction)
+        cents = round(transaction.amount * 100)
+        best, best_distance = None, None
+
+        for day_offset in (-1, 0, 1):
+            for amount_offset in (-1, 0, 1):
+                for candidate in self._grid.get((category, day_cell + day_offset, amount_cell + amount_offset), ()):
+                    day_distance = abs((candidate.date - transaction.date).days)
+                    amount_distance = abs(round(candidate.amount * 100) - cents)
+                    if day_distance > self.days or amount_distance > self.tolerance_cents:
+                        continue
+                    if best_distance is None or (day_distance, amount_distance) < best_distance:
+                        best, best_distance = candidate, (day_distance, amount_distance)
+
+        return best
+
+
+    def check(self, transaction, policy="reject"):
+        """
+        Look up a new transaction and apply the duplicate policy.
+        Returns True if the transaction should be kept (it is then indexed), False if it was dropped.
+        With "merge", the new note is folded into the existing transaction.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown duplicate policy: {policy}. Use one of {', '.join(POLICIES)}.")
+
+        existing = self.find(transaction)
+        if existing is not None:
+            self.duplicates.append((transaction, existing))
+            if policy == "merge":
+                existing.note = merge_notes(existing.note, transaction.note)
+            if policy != "report":
+                return False
+
+        self.add(transaction)
+        return True
+
+
+    def __len__(self):
+        """
+        Return the number of distinct exact keys in the index.
+        """
+        return len(self._exact)
@@ -3,19 +3,79 @@ Defines the Ledger class, which stores and manages all Transaction objects.
 Provides functionality for adding, removing, filtering, updating, and summarizing expense data.
 Used by main program actions for all expense operations.
 """
+import heapq
+import itertools
+from datetime import date
 from .transaction import Transaction
+from .query_cache import QueryCache
+from .dedup import DuplicateIndex, merge_notes
+from .budget import BudgetTracker
+from .sketch import SpendingStats
+from .sorted_view import SORT_FIELDS, SortedView, parse_sort_keys, sort_permutation
+from .recurring import RecurringRule
 
 class Ledger:
     """
     Manages a list of Transaction objects, including adding, removing, filtering, updating, and summarizing expenses.
     """
 
-    def __init__(self):
+    def __init__(self, cache_size=128):
         """
         Initialize an empty ledger.
+        cache_size limits the number of memoized query results (0 disables the cache).
         """
         self.transactions = []
 
+        # Version counters used to invalidate cached query results.
+        # The global version changes on every mutation; the per-month and per-category
+        # versions only change when a transaction in that month/category is touched.
+        self._version = 0
+        self._month_versions = {}
+        self._category_versions = {}
+        self._cache = QueryCache(cache_size)
+
+        # Recurring rules are expanded lazily by date-filtered queries (find_by_date_range, top_n),
+        # summaries, and totals. Their occurrences count from their date up to today; future ones
+        # are not spent yet. Views of the stored transactions (find_by_category, sorted_by) leave them out.
+        self.rules = []
+        self._rules_version = 0
+
+        # Running spend and amount sketches per (month, category), kept up to date by add/update/remove.
+        self.budget = BudgetTracker()
+        self.stats = SpendingStats()
+
+
+    def _touch(self, transaction):
+        """
+        Bump the version counters affected by a change to the given transaction.
+        """
+        self._version += 1
+        month_key = transaction.date.strftime("%Y-%m")
+        self._month_versions[month_key] = self._month_versions.get(month_key, 0) + 1
+        self._category_versions[transaction.category] = self._category_versions.get(transaction.category, 0) + 1
+
+
+    def _record(self, transaction, sign):
+        """
+        Add (sign=1) or remove (sign=-1) a transaction from the running per-(month, category) summaries.
+        """
+        self.budget.record(transaction.date, transaction.category, sign * transaction.amount)
+        self.stats.record(transaction.date, transaction.category, transaction.amount, sign)
+
+
+    def month_version(self, month_key):
+        """
+        Return the change counter for a 'YYYY-MM' month (0 if the month was never touched).
+        """
+        return self._month_versions.get(month_key, 0)
+
+
+    def cache_stats(self):
+        """
+        Return hit/miss counters and size information for the query cache.
+        """
+        return self._cache.stats()
+
 
     def add(self, transaction):
         """
@@ -27,16 +87,97 @@ class Ledger:
         # Assign incremental ID based on last transaction; start from 1 if ledger is empty.
         transaction._id = (self.transactions[-1]._id + 1) if self.transactions else 1
         self.transactions.append(transaction)
+        self._touch(transaction)
+        self._record(transaction, 1)
 
     
+    def add_rule(self, rule):
+        """
+        Add a RecurringRule to the ledger and automatically assign a sequential ID.
+        """
+        if not isinstance(rule, RecurringRule):
+            raise TypeError("Ledger can only store RecurringRule objects as rules")
+
+        rule._id = (self.rules[-1]._id + 1) if self.rules else 1
+        self.rules.append(rule)
+        self._rules_version += 1
+
+
+    def remove_rule(self, rule_id):
+        """
+        Remove a recurring rule by ID. Returns True if removed, False otherwise.
+        """
+        for i, rule in enumerate(self.rules):
+            if rule._id == rule_id:
+                self.rules.pop(i)
+                self._rules_version += 1
+                return True
+        return False
+
+
+    def materialize_rules(self, up_to):
+        """
+        Add every recurring occurrence up to the given date as a real Transaction.
+        Rules remember how far they were materialized, so occurrences are never added twice.
+        Returns the number of transactions added.
+        """
+        added = 0
+        for rule in self.rules:
+            for transaction in rule.occurrences(None, up_to):
+                self.add(transaction)
+                added += 1
+            if rule.materialized_through is None or up_to > rule.materialized_through:
+                rule.materialized_through = up_to
+
+        self._rules_version += 1
+        return added
+
+
+    def _rule_occurrences(self, start_date, end_date):
+        """
+        Yield the recurring occurrences within [start_date, end_date], capped at today.
+        """
+        end_date = min(end_date, date.today())
+        for rule in self.rules:
+            yield from rule.occurrences(start_date, end_date)
+
+
+    def import_transactions(self, transactions, policy="reject", days=0, amount_tolerance=0.0):
+        """
+        Add many transactions, detecting duplicates of existing (or earlier imported) entries.
+        policy is "reject" (skip duplicates), "merge" (fold the note into the existing entry)
+        or "report" (add them anyway). days and amount_tolerance enable fuzzy matching.
+        Runs in O(n) overall using a hash index. Returns the list of (new, existing) duplicate pairs.
+        """
+        index = DuplicateIndex(self.transactions, days, amount_tolerance)
+
+        for transaction in transactions:
+            # Merging is applied here rather than in the index so the version counters are bumped.
+            if index.check(transaction, "reject" if policy == "merge" else policy):
+                self.add(transaction)
+            elif policy == "merge":
+                new, existing = index.duplicates[-1]
+                existing.note = merge_notes(existing.note, new.note)
+                self._touch(existing)
+
+        return index.duplicates
+
+
     def update(self, transaction_id, *, amount=None, category=None, date=None, note=None):
         """
         Update an existing transaction's fields by ID.
         Parameters are optional; only non-None values overwrite the old fields.
         Returns True if the transaction was found and updated, otherwise False.
+        Raises ValueError if the new amount is not > 0.
         """
+        if amount is not None and amount <= 0:
+            raise ValueError("Amount must be > 0")
+
         for transaction in self.transactions:
             if transaction._id == transaction_id:
+                # Invalidate both the old and the new month/category of the transaction.
+                self._touch(transaction)
+                self._record(transaction, -1)
                 if amount is not None:
                     transaction.amount = amount
                 if category is not None:
@@ -45,6 +186,8 @@ class Ledger:
                     transaction.date = date
                 if note is not None:
                     transaction.note = note
+                self._touch(transaction)
+                self._record(transaction, 1)
                 return True
 
         return False
@@ -57,43 +200,148 @@ class Ledger:
         for i, transaction in enumerate(self.transactions):
             if transaction._id == transaction_id:
                 self.transactions.pop(i)
+                self._touch(transaction)
+                self._record(transaction, -1)
                 return True
         return False
 
 
     def unique_categories(self):
         """Return a set of all categories."""
-        return {transaction.category for transaction in self.transactions}
+        categories = self._cache.get_or_compute(
+            ("unique_categories",),
+            self._version,
+            lambda: {transaction.category for transaction in self.transactions}
+        )
+        return set(categories)
     
 
     def find_by_category(self, category):
         """
         Return a list of transactions whose category matches exactly.
         """
-        return [transaction for transaction in self.transactions if transaction.category == category]
+        # Only changes to this category can alter the result.
+        result = self._cache.get_or_compute(
+            ("find_by_category", category),
+            self._category_versions.get(category, 0),
+            lambda: [transaction for transaction in self.transactions if transaction.category == category]
+        )
+        return list(result)
 
 
     def find_by_date_range(self, start_date, end_date):
         """
         Return all transactions whose date is between start_date and end_date (inclusive).
+        Occurrences of recurring rules in the range (up to today) are included after the stored transactions.
         """
-        results = []
-        for transaction in self.transactions:
-            if start_date <= transaction.date <= end_date:
-                results.append(transaction)
-        return results
+        def compute():
+            results = []
+            for transaction in self.transactions:
+                if start_date <= transaction.date <= end_date:
+                    results.append(transaction)
+            results.extend(self._rule_occurrences(start_date, end_date))
+            return results
+
+        # Only changes to the months covered by the range can alter the result.
+        start_key = f"{start_date.year:04d}-{start_date.month:02d}"
+        end_key = f"{end_date.year:04d}-{end_date.month:02d}"
+        stamp = tuple(
+            (month_key, version) for month_key, version in self._month_versions.items()
+            if start_key <= month_key <= end_key
+        )
+        stamp += (self._rules_version, date.today() if self.rules else None)
+        result = self._cache.get_or_compute(("find_by_date_range", start_date, end_date), stamp, compute)
+        return list(result)
 
 
     def monthly_summary(self):
         """
         Return a dictionary mapping 'YYYY-MM' → total amount for that month.
+        Includes recurring occurrences up to today.
         """
-        # Build a summary where each key is 'YYYY-MM' and value is the sum of amounts in that month.
-        summary = {}
-        for transaction in self.transactions:
-            month_key = transaction.date.strftime("%Y-%m")
-            summary[month_key] = summary.get(month_key, 0) + transaction.amount
-        return summary
+        def compute():
+            # Build a summary where each key is 'YYYY-MM' and value is the sum of amounts in that month.
+            summary = {}
+            for transaction in self.transactions:
+                month_key = transaction.date.strftime("%Y-%m")
+                summary[month_key] = summary.get(month_key, 0) + transaction.amount
+
+            # Recurring rules only need their occurrence dates, not full transactions.
+            today = date.today()
+            for rule in self.rules:
+                for day in rule.occurrence_dates(None, today):
+                    month_key = day.strftime("%Y-%m")
+                    summary[month_key] = summary.get(month_key, 0) + rule.amount
+            return summary
+
+        stamp = (self._version, self._rules_version, date.today() if self.rules else None)
+        summary = self._cache.get_or_compute(("monthly_summary",), stamp, compute)
+        return dict(summary)
+
+
+    def total_amount(self):
+        """
+        Return the total spending across all transactions.
+        Includes recurring occurrences up to today, counted without generating them.
+        """
+        def compute():
+            today = date.today()
+            total = sum(transaction.amount for transaction in self.transactions)
+            return total + sum(rule.amount * rule.count(None, today) for rule in self.rules)
+
+        stamp = (self._version, self._rules_version, date.today() if self.rules else None)
+        return self._cache.get_or_compute(("total_amount",), stamp, compute)
+
+
+    def sorted_by(self, *keys):
+        """
+        Return a SortedView of all stored transactions ordered by the given fields,
+        e.g. sorted_by("category", "-amount"). A leading '-' sorts that field descending.
+        The sort permutation is cached until the next add/update/remove, so repeating a sort is free.
+        """
+        sort_keys = parse_sort_keys(keys)
+        permutation = self._cache.get_or_compute(
+            ("sorted_by", sort_keys),
+            self._version,
+            lambda: sort_permutation(self.transactions, sort_keys)
+        )
+        return SortedView(self.transactions, permutation)
+
+
+    def top_n(self, n, key="amount", largest=True, start_date=None, end_date=None, category=None):
+        """
+        Return the n transactions with the largest (or smallest) value of key,
+        optionally limited to a date range and/or category.
+        With a date range, recurring occurrences in it (up to today) are included, as in find_by_date_range.
+        Uses a heap of size n over the transactions, so it runs in O(len * log n) without copying the ledger.
+        """
+        if key not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {key}. Use one of {', '.join(SORT_FIELDS)}.")
+        if n <= 0:
+            return []
+
+        # For large n over the whole ledger, slicing the cached full sort is cheaper than a big heap.
+        # Both orders keep ties in insertion order, so the results are identical.
+        if start_date is None and end_date is None and category is None and n * 8 >= len(self.transactions):
+            return self.sorted_by(("-" if largest else "") + key)[:n]
+
+        get = SORT_FIELDS[key]
+        selected = (
+            transaction for transaction in self.transactions
+            if (start_date is None or transaction.date >= start_date)
+            and (end_date is None or transaction.date <= end_date)
+            and (category is None or transaction.category == category)
+        )
+        if start_date is not None or end_date is not None:
+            occurrences = (
+                transaction for transaction in self._rule_occurrences(start_date or date.min, end_date or date.max)
+                if category is None or transaction.category == category
+            )
+            selected = itertools.chain(selected, occurrences)
+
+        if largest:
+            return heapq.nlargest(n, selected, key=get)
+        return heapq.nsmallest(n, selected, key=get)
 
 
     def __len__(self):
@@ -0,0 +1,71 @@
+"""
+Defines the QueryCache class, a small LRU cache for Ledger query results.
+Each entry remembers the version stamp it was computed under, so the Ledger can
+invalidate results simply by bumping version counters on add, update, and remove.
+"""
+from collections import OrderedDict
+
+class QueryCache:
+    """
+    Least-recently-used cache mapping (query, parameters) → result.
+    An entry is only returned if its stored stamp equals the stamp supplied on lookup.
+    """
+
+    def __init__(self, maxsize=128):
+        """
+        Create an empty cache holding at most maxsize entries (0 disables caching).
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+
+    def get_or_compute(self, key, stamp, compute):
+        """
+        Return the cached value for key if its stamp is still current.
+        Otherwise call compute(), store the result under the new stamp, and return it.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        value = compute()
+
+        if self.maxsize > 0:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            # Evict the least recently used entries once over the size limit.
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return value
+
+
+    def clear(self):
+        """
+        Drop all cached entries (hit/miss counters are kept).
+        """
+        self._entries.clear()
+
+
+    def stats(self):
+        """
+        Return a dictionary with hit/miss counters and the current size.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+    def __len__(self):
+        """
+        Return the number of cached entries.
+        """
+        return len(self._entries)
@@ -0,0 +1,158 @@
+"""
+Defines the RecurringRule class, which describes a repeating expense (rent, subscriptions, passes).
+A rule is stored once and its occurrences are generated on demand for the dates a query covers,
+instead of being stored as individual transactions.
+"""
+import calendar
+from datetime import date, datetime, timedelta
+from .transaction import Transaction
+
+# Supported frequencies; interval repeats every N months, weeks, or days.
+FREQUENCIES = ("monthly", "weekly", "daily")
+
+
+def add_months(start, months, day):
+    """
+    Return the date months after start, on the given day of month (clamped to the month's length).
+    """
+    month_index = start.year * 12 + (start.month - 1) + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+class RecurringRule:
+    """
+    A repeating expense with an amount, category, start date, optional end date, and frequency.
+    Occurrences on or before materialized_through have already been added to the ledger as
+    real transactions and are no longer generated.
+    """
+
+    def __init__(self, amount, category, start_str, end_str=None, frequency="monthly", interval=1, note="",
+                 materialized_through=None, _id=None):
+        """
+        Create a new RecurringRule.
+
+        Parameters:
+            amount: The amount of each occurrence (must be > 0).
+            category: The category name.
+            start_str: The first occurrence, in YYYY-MM-DD format.
+            end_str: Optional last possible date, in YYYY-MM-DD format.
+            frequency: "monthly", "weekly", or "daily".
+            interval: Repeat every N months/weeks/days (must be >= 1).
+            note: Optional note copied to every occurrence.
+            materialized_through: Optional YYYY-MM-DD date up to which occurrences were materialized.
+            _id: Optional ID assigned by Ledger.
+        """
+        # Validate the shared fields the same way a Transaction does.
+        Transaction(amount, category, start_str, note)
+
+        self.amount = amount
+        self.category = category
+        self.start = datetime.strptime(start_str, "%Y-%m-%d").date()
+        self.end = datetime.strptime(end_str, "%Y-%m-%d").date() if end_str else None
+        self.frequency = frequency
+        self.interval = interval
+        self.note = note
+        self.materialized_through = (
+            datetime.strptime(materialized_through, "%Y-%m-%d").date() if materialized_through else None
+        )
+        self._id = _id
+
+        self._validate()
+
+
+    def _validate(self):
+        """
+        Validate the rule's fields.
+        Raises ValueError if any attribute is invalid.
+        """
+        if self.frequency not in FREQUENCIES:
+            raise ValueError(f"Frequency must be one of {', '.join(FREQUENCIES)}")
+
+        if not isinstance(self.interval, int) or self.interval < 1:
+            raise ValueError("Interval must be an integer >= 1")
+
+        if self.end is not None and self.end < self.start:
+            raise ValueError("End date must not be before the start date")
+
+
+    def _nth(self, n):
+        """
+        Return the date of the n-th occurrence (n = 0 is the start date).
+        """
+        if self.frequency == "monthly":
+            return add_months(self.start, n * self.interval, self.start.day)
+        step = 7 * self.interval if self.frequency == "weekly" else self.interval
+        return self.start + timedelta(days=n * step)
+
+
+    def _first_index_on_or_after(self, day):
+        """
+        Return the smallest n whose occurrence date is on or after day.
+        """
+        if day <= self.start:
+            return 0
+
+        if self.frequency == "monthly":
+            months = (day.year - self.start.year) * 12 + (day.month - self.start.month)
+            n = max(months // self.interval, 0)
+            # The estimate can be one step early because of day-of-month clamping.
+            while self._nth(n) < day:
+                n += 1
+            return n
+
+        step = 7 * self.interval if self.frequency == "weekly" else self.interval
+        return -(-(day - self.start).days // step)
+
+
+    def _bounds(self, start_date, end_date):
+        """
+        Return the (first, last) occurrence indexes within [start_date, end_date],
+        excluding materialized occurrences and anything after the rule's end. last < first if none.
+        """
+        if self.materialized_through is not None:
+            after = self.materialized_through + timedelta(days=1)
+            start_date = after if start_date is None else max(start_date, after)
+        if self.end is not None:
+            end_date = self.end if end_date is None else min(end_date, self.end)
+        if end_date is None:
+            raise ValueError("An end date is required for rules without an end")
+
+        first = self._first_index_on_or_after(start_date or self.start)
+        last = self._first_index_on_or_after(end_date + timedelta(days=1)) - 1
+        return first, last
+
+
+    def occurrence_dates(self, start_date=None, end_date=None):
+        """
+        Yield the occurrence dates within [start_date, end_date] (inclusive), one at a time.
+        """
+        first, last = self._bounds(start_date, end_date)
+        for n in range(first, last + 1):
+            yield self._nth(n)
+
+
+    def occurrences(self, start_date=None, end_date=None):
+        """
+        Yield a Transaction for each occurrence within [start_date, end_date].
+        Occurrences have no ID of their own; their rule_id is set to this rule's ID.
+        """
+        for day in self.occurrence_dates(start_date, end_date):
+            yield Transaction(self.amount, self.category, day.isoformat(), self.note, rule_id=self._id)
+
+
+    def count(self, start_date=None, end_date=None):
+        """
+        Return the number of occurrences within [start_date, end_date] without generating them.
+        """
+        first, last = self._bounds(start_date, end_date)
+        return max(last - first + 1, 0)
+
+
+    def __repr__(self):
+        """
+        Return a developer-friendly string representation of the rule.
+        """
+        return (f"RecurringRule(id={self._id}, amount={self.amount}, category='{self.category}', "
+                f"start={self.start}, end={self.end}, frequency='{self.frequency}', interval={self.interval})")
@@ -0,0 +1,271 @@
+"""
+Small, mergeable summaries of expense amounts.
+QuantileSketch estimates percentiles (median, p90, p99) with a bounded relative error,
+Histogram counts amounts in fixed bins, and SpendingStats keeps one of each per
+(month, category) so the Ledger can update them as transactions change.
+"""
+import math
+from bisect import bisect_left
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Upper edges of the histogram bins in dollars; the last bin is open-ended.
+DEFAULT_BIN_EDGES = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (the DDSketch scheme) for positive values.
+    Every value is stored as a count in bucket ceil(log(value) / log(gamma)), so any estimated
+    quantile is within relative_accuracy of the exact value, the size grows only with the
+    logarithm of the value range, and sketches can be merged or have values removed exactly.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """
+        Create an empty sketch whose quantile estimates are within relative_accuracy (e.g. 0.01 = 1%).
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.count = 0
+        # bucket key → number of values in that bucket
+        self.buckets = {}
+
+
+    def _key(self, value):
+        """
+        Return the bucket key for a positive value.
+        """
+        if value <= 0:
+            raise ValueError("QuantileSketch only accepts values > 0")
+        return math.ceil(math.log(value) / self._log_gamma)
+
+
+    def add(self, value, count=1):
+        """
+        Add a value (count times) to the sketch.
+        """
+        key = self._key(value)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += count
+
+
+    def remove(self, value, count=1):
+        """
+        Remove a value previously added to the sketch.
+        """
+        key = self._key(value)
+        remaining = self.buckets.get(key, 0) - count
+        if remaining < 0:
+            raise ValueError(f"Value {value} is not in the sketch")
+        if remaining == 0:
+            del self.buckets[key]
+        else:
+            self.buckets[key] = remaining
+        self.count -= count
+
+
+    def merge(self, other):
+        """
+        Add all values of another sketch with the same accuracy into this one.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += other.count
+
+
+    def quantile(self, q):
+        """
+        Return the estimated q-quantile (0 <= q <= 1), or None if the sketch is empty.
+        This estimates the value at rank floor(q * (count - 1)) in sorted order.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+
+        rank = int(q * (self.count - 1))
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # The midpoint (in relative terms) of the bucket's value range.
+                return 2 * self._gamma ** key / (self._gamma + 1)
+
+
+    def to_dict(self):
+        """
+        Return a JSON-serializable representation of the sketch.
+        """
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": {str(key): count for key, count in sorted(self.buckets.items())},
+        }
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a sketch from the output of to_dict.
+        """
+        sketch = cls(data["relative_accuracy"])
+        for key, count in data["buckets"].items():
+            sketch.buckets[int(key)] = count
+            sketch.count += count
+        return sketch
+
+
+class Histogram:
+    """
+    Counts of values in fixed bins. Bin i holds values up to bin_edges[i];
+    the last bin holds everything above the last edge.
+    """
+
+    def __init__(self, bin_edges=DEFAULT_BIN_EDGES):
+        """
+        Create an empty histogram with the given (ascending) upper bin edges.
+        """
+        self.bin_edges = tuple(bin_edges)
+        self.counts = [0] * (len(self.bin_edges) + 1)
+
+
+    def _bin(self, value):
+        """
+        Return the index of the bin holding value.
+        """
+        # Values equal to an edge belong to the bin that edge closes.
+        return bisect_left(self.bin_edges, value)
+
+
+    def add(self, value, count=1):
+        """
+        Count a value.
+        """
+        self.counts[self._bin(value)] += count
+
+
+    def remove(self, value, count=1):
+        """
+        Un-count a value previously added.
+        """
+        self.counts[self._bin(value)] -= count
+
+
+    def merge(self, other):
+        """
+        Add the counts of another histogram with the same bins.
+        """
+        if other.bin_edges != self.bin_edges:
+            raise ValueError("Cannot merge histograms with different bins")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+
+    def labels(self):
+        """
+        Return a readable label for each bin, e.g. '$5-$10' and '>$1000'.
+        """
+        labels = []
+        lower = 0
+        for edge in self.bin_edges:
+            labels.append(f"${lower}-${edge}")
+            lower = edge
+        labels.append(f">${lower}")
+        return labels
+
+
+    def to_dict(self):
+        """
+        Return a JSON-serializable representation of the histogram.
+        """
+        return {"bin_edges": list(self.bin_edges), "counts": list(self.counts)}
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a histogram from the output of to_dict.
+        """
+        histogram = cls(data["bin_edges"])
+        histogram.counts = list(data["counts"])
+        return histogram
+
+
+class SpendingStats:
+    """
+    Keeps a QuantileSketch and a Histogram per (month, category), updated incrementally.
+    Queries merge the small per-group summaries instead of sorting amounts.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, bin_edges=DEFAULT_BIN_EDGES):
+        """
+        Create empty statistics with the given sketch accuracy and histogram bins.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.bin_edges = tuple(bin_edges)
+        # (month, category) → QuantileSketch / Histogram
+        self._sketches = {}
+        self._histograms = {}
+
+
+    def record(self, date_obj, category, amount, sign=1):
+        """
+        Add (sign=1) or remove (sign=-1) an amount for the transaction's month and category.
+        """
+        group = (date_obj.strftime("%Y-%m"), category)
+
+        if sign > 0:
+            if group not in self._sketches:
+                self._sketches[group] = QuantileSketch(self.relative_accuracy)
+                self._histograms[group] = Histogram(self.bin_edges)
+            self._sketches[group].add(amount)
+            self._histograms[group].add(amount)
+            return
+
+        self._sketches[group].remove(amount)
+        self._histograms[group].remove(amount)
+        if self._sketches[group].count == 0:
+            del self._sketches[group]
+            del self._histograms[group]
+
+
+    def _groups(self, month, category):
+        """
+        Return the (month, category) groups matching the filters (None matches everything).
+        """
+        return [
+            group for group in self._sketches
+            if (month is None or group[0] == month) and (category is None or group[1] == category)
+        ]
+
+
+    def sketch(self, month=None, category=None):
+        """
+        Return a merged QuantileSketch for the given month and/or category.
+        """
+        merged = QuantileSketch(self.relative_accuracy)
+        for group in self._groups(month, category):
+            merged.merge(self._sketches[group])
+        return merged
+
+
+    def histogram(self, month=None, category=None):
+        """
+        Return a merged Histogram for the given month and/or category.
+        """
+        merged = Histogram(self.bin_edges)
+        for group in self._groups(month, category):
+            merged.merge(self._histograms[group])
+        return merged
+
+
+    def categories(self, month=None):
+        """
+        Return the sorted categories that have amounts (optionally in one month).
+        """
+        return sorted({group[1] for group in self._groups(month, None)})
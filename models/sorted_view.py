@@ -0,0 +1,88 @@
+"""
+Defines the SortedView class and helpers for sorting transactions by one or more fields.
+A SortedView reads the ledger's transactions through a cached sort permutation,
+so slicing or iterating a view never copies or re-sorts the ledger.
+"""
+
+# Fields that can be used as sort keys.
+SORT_FIELDS = {
+    "amount": lambda transaction: transaction.amount,
+    "category": lambda transaction: transaction.category.lower(),
+    "date": lambda transaction: transaction.date,
+    # Recurring occurrences have no ID; they sort after the stored transactions.
+    "id": lambda transaction: (transaction._id is None, transaction._id or 0),
+    "note": lambda transaction: (transaction.note or "").lower(),
+}
+
+
+def parse_sort_keys(keys):
+    """
+    Turn sort keys like ("category", "-amount") into a tuple of (field, descending) pairs.
+    A leading '-' sorts that field in descending order. Raises ValueError for unknown fields.
+    """
+    parsed = []
+    for key in keys:
+        key = key.strip()
+        descending = key.startswith("-")
+        field = key.lstrip("-+").lower()
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {field}. Use one of {', '.join(SORT_FIELDS)}.")
+        parsed.append((field, descending))
+
+    if not parsed:
+        raise ValueError("At least one sort field is required")
+    return tuple(parsed)
+
+
+def sort_permutation(transactions, sort_keys):
+    """
+    Return the list of indexes that puts transactions in the order given by parsed sort_keys.
+    Ties keep their original (insertion) order.
+    """
+    permutation = list(range(len(transactions)))
+
+    # Stable sorts applied from the last key to the first give a multi-column sort
+    # where each column can have its own direction.
+    for field, descending in reversed(sort_keys):
+        get = SORT_FIELDS[field]
+        permutation.sort(key=lambda i: get(transactions[i]), reverse=descending)
+
+    return permutation
+
+
+class SortedView:
+    """
+    Read-only sequence of transactions in sorted order.
+    Valid until the ledger is next changed; ask the ledger for a new view after add/update/remove.
+    """
+
+    def __init__(self, transactions, permutation):
+        """
+        Create a view of transactions in the order given by permutation (a list of indexes).
+        """
+        self._transactions = transactions
+        self._permutation = permutation
+
+
+    def __len__(self):
+        """
+        Return the number of transactions in the view.
+        """
+        return len(self._permutation)
+
+
+    def __getitem__(self, index):
+        """
+        Return the transaction at a sorted position, or a list for a slice.
+        """
+        if isinstance(index, slice):
+            return [self._transactions[i] for i in self._permutation[index]]
+        return self._transactions[self._permutation[index]]
+
+
+    def __iter__(self):
+        """
+        Iterate over the transactions in sorted order.
+        """
+        for i in self._permutation:
+            yield self._transactions[i]
@@ -12,7 +12,7 @@ class Transaction:
     The class also handles date parsing and input validation.
     """
 
-    def __init__(self, amount, category, date_str, note="", _id=None):
+    def __init__(self, amount, category, date_str, note="", _id=None, rule_id=None):
         """
         Create a new Transaction.
 
@@ -22,12 +22,14 @@ class Transaction:
             date_str: The date string in YYYY-MM-DD format.
             note: Optional note.
             _id: Optional ID assigned by Ledger.
+            rule_id: ID of the RecurringRule this is an (unstored) occurrence of, if any.
         """
         self.amount = amount
         self.category = category
         self.date = self._parse_date(date_str)
         self.note = note
         self._id = _id
+        self.rule_id = rule_id
 
         self._validate()
 
@@ -1,9 +1,24 @@
 """
 Unit tests for the Ledger class.
 """
+import io
+import os
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from pathlib import Path
+from data_io.export import archive_closed_months, archived_months
+from data_io.ledger_files import LedgerFiles
+from data_io.storage import load_csv, save_csv, rows_to_transactions, transactions_to_rows
+from main import load_data, save_data
 from models.ledger import Ledger
+from models.dedup import DuplicateIndex
 from models.transaction import Transaction
-from datetime import date
+
+# Set LEDGER_SCALING_TESTS=1 to also run the (slower, timing-based) complexity checks.
+SCALING_TESTS = os.environ.get("LEDGER_SCALING_TESTS") == "1"
 
 def test_add_and_len():
     ledger = Ledger()
@@ -71,6 +86,487 @@ def test_invalid_amount():
         assert True
 
 
+def test_query_cache_hits_and_invalidation():
+    ledger = Ledger()
+    ledger.add(Transaction(10, "Food", "2025-12-01"))
+    ledger.add(Transaction(30, "Rent", "2025-11-15"))
+
+    assert ledger.monthly_summary()["2025-12"] == 10
+    assert ledger.monthly_summary()["2025-12"] == 10
+    assert ledger.cache_stats()["hits"] == 1
+
+    ledger.add(Transaction(5, "Food", "2025-12-02"))
+    assert ledger.monthly_summary()["2025-12"] == 15
+    assert ledger.total_amount() == 45
+
+    ledger.update(3, amount=7)
+    assert ledger.total_amount() == 47
+
+    ledger.remove(3)
+    assert ledger.total_amount() == 40
+
+
+def test_query_cache_per_category_invalidation():
+    ledger = Ledger()
+    ledger.add(Transaction(10, "Food", "2025-12-01"))
+    ledger.add(Transaction(30, "Rent", "2025-11-15"))
+
+    assert len(ledger.find_by_category("Food")) == 1
+    hits_before = ledger.cache_stats()["hits"]
+
+    # Changing an unrelated category keeps the cached Food result valid.
+    ledger.add(Transaction(20, "Rent", "2025-12-01"))
+    assert len(ledger.find_by_category("Food")) == 1
+    assert ledger.cache_stats()["hits"] == hits_before + 1
+
+    # Moving a transaction into Food invalidates it.
+    ledger.update(3, category="Food")
+    assert len(ledger.find_by_category("Food")) == 2
+    assert len(ledger.find_by_date_range(date(2025, 12, 1), date(2025, 12, 31))) == 2
+
+
+def test_query_cache_lru_eviction():
+    ledger = Ledger(cache_size=2)
+    ledger.add(Transaction(10, "Food", "2025-12-01"))
+
+    ledger.find_by_category("Food")
+    ledger.find_by_category("Rent")
+    ledger.find_by_category("Transport")
+
+    assert ledger.cache_stats()["size"] == 2
+
+
+def test_import_rejects_exact_duplicates():
+    ledger = Ledger()
+    ledger.add(Transaction(10, "Food", "2025-12-01", "Lunch"))
+
+    duplicates = ledger.import_transactions([
+        Transaction(10.0, " food ", "2025-12-01", "lunch"),
+        Transaction(12, "Food", "2025-12-01", "Lunch"),
+        Transaction(12, "Food", "2025-12-01", "Lunch"),
+    ])
+
+    assert len(ledger) == 2
+    assert len(duplicates) == 2
+    assert duplicates[0][1]._id == 1
+
+
+def test_import_fuzzy_merge_and_report():
+    ledger = Ledger()
+    ledger.add(Transaction(50, "Shopping", "2025-12-01", "shoes"))
+
+    ledger.import_transactions([Transaction(50.4, "Shopping", "2025-12-03", "card 1234")],
+                               policy="merge", days=2, amount_tolerance=0.5)
+    assert len(ledger) == 1
+    assert ledger.transactions[0].note == "shoes; card 1234"
+
+    # Too far apart in days to be the same expense.
+    duplicates = ledger.import_transactions([Transaction(50, "Shopping", "2025-12-04")], days=2, amount_tolerance=0.5)
+    assert duplicates == []
+
+    duplicates = ledger.import_transactions([Transaction(50, "Shopping", "2025-12-05")], policy="report", days=2)
+    assert len(duplicates) == 1
+    assert len(ledger) == 3
+
+
+def test_duplicate_index_rows():
+    index = DuplicateIndex()
+    assert index.check(Transaction(10, "Food", "2025-12-01"))
+    assert not index.check(Transaction(10, "Food", "2025-12-01"))
+    assert len(index.duplicates) == 1
+
+
+def test_budget_running_totals():
+    ledger = Ledger()
+    ledger.budget.set_limit("Food", 25)
+    ledger.add(Transaction(10, "Food", "2025-12-01"))
+    ledger.add(Transaction(20, "Food", "2025-12-02"))
+    ledger.add(Transaction(5, "Food", "2025-11-30"))
+
+    assert ledger.budget.spent("2025-12", "Food") == 30
+    assert ledger.budget.is_over("2025-12", "Food")
+    assert not ledger.budget.is_over("2025-11", "Food")
+
+    # Moving an expense to another category and month updates both sides.
+    ledger.update(2, category="Transport", date=date(2025, 11, 1))
+    assert ledger.budget.spent("2025-12", "Food") == 10
+    assert ledger.budget.spent("2025-11", "Transport") == 20
+
+    ledger.remove(1)
+    assert ledger.budget.month_report("2025-12") == [("Food", 0, 25)]
+
+
+def test_sorted_by_multiple_columns_and_cache():
+    ledger = Ledger()
+    ledger.add(Transaction(10, "Food", "2025-12-03"))
+    ledger.add(Transaction(300, "Rent", "2025-12-01"))
+    ledger.add(Transaction(20, "Food", "2025-12-02"))
+
+    view = ledger.sorted_by("category", "-amount")
+    assert [t._id for t in view] == [3, 1, 2]
+    assert view[0]._id == 3
+    assert len(view[:2]) == 2
+
+    misses = ledger.cache_stats()["misses"]
+    ledger.sorted_by("category", "-amount")
+    assert ledger.cache_stats()["misses"] == misses
+
+    # A mutation invalidates the cached permutation.
+    ledger.update(1, amount=50)
+    assert [t._id for t in ledger.sorted_by("category", "-amount")] == [1, 3, 2]
+
+
+def test_top_n():
+    ledger = Ledger()
+    for i, amount in enumerate([5, 50, 20, 50, 1, 99], start=1):
+        ledger.add(Transaction(amount, "Food" if i % 2 else "Rent", f"2025-12-{i:02d}"))
+
+    assert [t.amount for t in ledger.top_n(2)] == [99, 50]
+    assert [t.amount for t in ledger.top_n(2, largest=False)] == [1, 5]
+    assert [t._id for t in ledger.top_n(3, start_date=date(2025, 12, 2), end_date=date(2025, 12, 4))] == [2, 4, 3]
+    assert [t._id for t in ledger.top_n(1, category="Food")] == [3]
+
+    # The heap (small n) and the cached full sort agree, including ties.
+    big = Ledger()
+    for i in range(100):
+        big.add(Transaction(i % 7 + 1, "Food", "2025-12-01"))
+    assert big.top_n(5) == big.sorted_by("-amount")[:5]
+    assert big.top_n(5, largest=False) == big.sorted_by("amount")[:5]
+
+
+# --- Differential harness ---------------------------------------------------------------
+# Random operation sequences are replayed against ReferenceLedger (a plain list scan with
+# no caching or indexes) and against every engine; all of them must return the same results.
+
+CATEGORIES = ["Food", "Rent", "Transport", "Fun", "food"]
+NOTES = ["", "lunch", "a, b", 'say "hi"', "line\nbreak", "café"]
+FIRST_DAY = date(2024, 11, 20)
+
+# (cache_size, file suffix) of each engine: the cache disabled, tiny (constant eviction)
+# and default, each saved and reloaded through a different storage format.
+ENGINES = [(0, ".csv"), (2, ".csv.gz"), (128, ".csv.xz")]
+# One more engine saves and reloads the way the program does (main.save_data / load_data),
+# with the months before ARCHIVE_BEFORE moved into an archive directory after each save.
+ARCHIVE_BEFORE = "2025-01"
+
+
+class ReferenceLedger:
+    """
+    The simplest possible ledger: a list of (id, amount, category, date, note) records, scanned on every query.
+    """
+
+    def __init__(self, keeps_file_ids=False):
+        self.records = []
+        # With keeps_file_ids, saving keeps the ID each record already has in the file (as the
+        # program's merging save does) and new records get IDs after all of them, so same-day
+        # records load back in file ID order. file_ids maps record ID → file ID once saved.
+        self.keeps_file_ids = keeps_file_ids
+        self.file_ids = {}
+        self.next_file_id = 1
+
+    def add(self, amount, category, day, note):
+        new_id = self.records[-1][0] + 1 if self.records else 1
+        self.records.append((new_id, amount, category, day, note))
+
+    def update(self, transaction_id, changes):
+        for i, record in enumerate(self.records):
+            if record[0] == transaction_id:
+                new_id, amount, category, day, note = record
+                self.records[i] = (
+                    new_id,
+                    changes.get("amount", amount),
+                    changes.get("category", category),
+                    changes.get("date", day),
+                    changes.get("note", note),
+                )
+                return True
+        return False
+
+    def remove(self, transaction_id):
+        for i, record in enumerate(self.records):
+            if record[0] == transaction_id:
+                self.records.pop(i)
+                self.file_ids.pop(transaction_id, None)
+                return True
+        return False
+
+    def reload(self):
+        # Saving writes the transactions in (date, id) order; loading renumbers them from 1.
+        if not self.keeps_file_ids:
+            ordered = sorted(self.records, key=lambda record: (record[3], record[0]))
+        else:
+            for record in self.records:
+                if record[0] not in self.file_ids:
+                    self.file_ids[record[0]] = self.next_file_id
+                    self.next_file_id += 1
+            ordered = sorted(self.records, key=lambda record: (record[3], self.file_ids[record[0]]))
+            self.file_ids = {i: self.file_ids[record[0]] for i, record in enumerate(ordered, start=1)}
+        self.records = [(i,) + record[1:] for i, record in enumerate(ordered, start=1)]
+
+    def query(self, operation, args):
+        if operation == "find_by_category":
+            return [record for record in self.records if record[2] == args[0]]
+        if operation == "find_by_date_range":
+            return [record for record in self.records if args[0] <= record[3] <= args[1]]
+        if operation == "monthly_summary":
+            summary = {}
+            for record in self.records:
+                month_key = record[3].strftime("%Y-%m")
+                summary[month_key] = summary.get(month_key, 0) + record[1]
+            return summary
+        if operation == "total_amount":
+            return sum(record[1] for record in self.records)
+        if operation == "unique_categories":
+            return {record[2] for record in self.records}
+        if operation == "sorted_by":
+            by_amount = sorted(self.records, key=lambda record: record[1], reverse=True)
+            return sorted(by_amount, key=lambda record: record[2].lower())
+        if operation == "top_n":
+            return sorted(self.records, key=lambda record: record[1], reverse=True)[:args[0]]
+        raise ValueError(operation)
+
+
+def snapshot(result):
+    """
+    Turn a Ledger query result into plain values comparable with ReferenceLedger results.
+    """
+    if isinstance(result, (dict, set, int, float)):
+        return result
+    return [(t._id, t.amount, t.category, t.date, t.note) for t in result]
+
+
+def run_query(ledger, operation, args):
+    if operation == "sorted_by":
+        return snapshot(list(ledger.sorted_by("category", "-amount")))
+    return snapshot(getattr(ledger, operation)(*args))
+
+
+def random_day(rng):
+    return FIRST_DAY + timedelta(days=rng.randrange(120))
+
+
+def random_operations(seed, count):
+    """
+    Yield a reproducible sequence of (operation, args) pairs.
+    IDs are drawn a little past the current maximum, so some updates and removes miss.
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.35:
+            yield "add", (round(rng.uniform(0.01, 500), 2), rng.choice(CATEGORIES), random_day(rng), rng.choice(NOTES))
+        elif roll < 0.45:
+            changes = {}
+            for field in rng.sample(["amount", "category", "date", "note"], rng.randint(1, 4)):
+                if field == "amount":
+                    # Occasionally invalid; every engine must reject it the same way.
+                    changes["amount"] = round(rng.uniform(0.01, 500), 2) if rng.random() < 0.9 else 0
+                elif field == "category":
+                    changes["category"] = rng.choice(CATEGORIES)
+                elif field == "date":
+                    changes["date"] = random_day(rng)
+                else:
+                    changes["note"] = rng.choice(NOTES)
+            yield "update", (rng.randint(1, count // 2), changes)
+        elif roll < 0.52:
+            yield "remove", (rng.randint(1, count // 2),)
+        elif roll < 0.62:
+            yield "find_by_category", (rng.choice(CATEGORIES + ["Missing"]),)
+        elif roll < 0.77:
+            start = random_day(rng)
+            yield "find_by_date_range", (start, start + timedelta(days=rng.randrange(-5, 60)))
+        elif roll < 0.83:
+            yield "monthly_summary", ()
+        elif roll < 0.87:
+            yield "total_amount", ()
+        elif roll < 0.90:
+            yield "unique_categories", ()
+        elif roll < 0.94:
+            yield "sorted_by", ()
+        elif roll < 0.97:
+            yield "top_n", (rng.choice([1, 3, 50]),)
+        else:
+            yield "reload", ()
+
+
+def reload_app(ledger, files, context):
+    """
+    Save the ledger with main.save_data, archive the older months, and load it back with main.load_data
+    into a fresh Ledger, as a restart of the program would. Returns the new (ledger, files) pair.
+    """
+    with redirect_stdout(io.StringIO()):
+        save_data(ledger, files)
+    archive_closed_months(files.filepath, ARCHIVE_BEFORE, files.archive_dir)
+
+    # Every file must stay in date order, since reconciliation streams them by date.
+    for path in [files.filepath, *archived_months(files.archive_dir).values()]:
+        dates = [row["date"] for row in load_csv(path)]
+        assert dates == sorted(dates), (context, path)
+
+    fresh = Ledger()
+    fresh_files = LedgerFiles(files.filepath, files.archive_dir)
+    messages = []
+    load_data(fresh, fresh_files, report=lambda message, color="": messages.append((message, color)))
+    assert not [message for message, color in messages if color == "red"], (context, messages)
+    return fresh, fresh_files
+
+
+def replay(seed, count, tmp):
+    """
+    Replay one random sequence against every engine and its reference, comparing after each step.
+    """
+    engines = [(Ledger(cache_size=cache_size), Path(tmp) / f"engine{i}{suffix}")
+               for i, (cache_size, suffix) in enumerate(ENGINES)]
+    app_dir = Path(tmp) / f"app{seed}"
+    app_dir.mkdir()
+    app = [(Ledger(), LedgerFiles(app_dir / "expenses.csv", app_dir / "archive"))]
+    # The app engine keeps file IDs across saves, so after a reload its IDs follow a reference of its own.
+    groups = [(ReferenceLedger(), engines), (ReferenceLedger(keeps_file_ids=True), app)]
+
+    for step, (operation, args) in enumerate(random_operations(seed, count)):
+        context = f"seed {seed}, step {step}: {operation}{args}"
+        groups = [(reference, replay_step(reference, engines, operation, args, context))
+                  for reference, engines in groups]
+
+    # The running budget totals must agree with a fresh scan as well.
+    for reference, engines in groups:
+        for ledger, _ in engines:
+            assert snapshot(list(ledger)) == reference.records
+            for month_key, total in reference.query("monthly_summary", ()).items():
+                spent = sum(ledger.budget.spent(month_key, category) for category in CATEGORIES)
+                assert abs(spent - total) < 1e-6, f"seed {seed}: budget totals for {month_key}"
+
+
+def replay_step(reference, engines, operation, args, context):
+    """
+    Apply one operation to the reference and the engines, and return the engines (new ones after a reload).
+    """
+    if operation == "add":
+        reference.add(*args)
+        for ledger, _ in engines:
+            amount, category, day, note = args
+            ledger.add(Transaction(amount, category, day.isoformat(), note))
+    elif operation == "update":
+        transaction_id, changes = args
+        if changes.get("amount", 1) <= 0:
+            for ledger, _ in engines:
+                try:
+                    ledger.update(transaction_id, **changes)
+                    assert False, context
+                except ValueError:
+                    pass
+            return engines
+        expected = reference.update(transaction_id, changes)
+        for ledger, _ in engines:
+            assert ledger.update(transaction_id, **changes) == expected, context
+    elif operation == "remove":
+        expected = reference.remove(*args)
+        for ledger, _ in engines:
+            assert ledger.remove(*args) == expected, context
+    elif operation == "reload":
+        reference.reload()
+        reloaded = []
+        for ledger, path in engines:
+            if isinstance(path, LedgerFiles):
+                reloaded.append(reload_app(ledger, path, context))
+                continue
+            save_csv(path, transactions_to_rows(sorted(ledger)))
+            fresh = Ledger(cache_size=ledger.cache_stats()["maxsize"])
+            for transaction in rows_to_transactions(load_csv(path)):
+                fresh.add(transaction)
+            reloaded.append((fresh, path))
+        engines = reloaded
+    else:
+        expected = reference.query(operation, args)
+        for ledger, _ in engines:
+            assert run_query(ledger, operation, args) == expected, context
+
+    for ledger, _ in engines:
+        assert len(ledger) == len(reference.records), context
+    return engines
+
+
+def test_differential_random_sequences():
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed in range(8):
+            replay(seed, 400, tmp)
+
+
+# --- Scaling checks (opt-in) -------------------------------------------------------------
+
+def build_ledger(n, seed=0):
+    rng = random.Random(seed)
+    ledger = Ledger()
+    for _ in range(n):
+        ledger.add(Transaction(round(rng.uniform(0.01, 500), 2), rng.choice(CATEGORIES[:4]),
+                               random_day(rng).isoformat()))
+    # A fixed handful of rare entries, so the size of some results does not grow with n.
+    for i in range(10):
+        ledger.add(Transaction(1 + i, "Rare", "2025-01-15"))
+    return ledger
+
+
+def per_call(function, calls):
+    """
+    Return the best of three average times of calling function() calls times.
+    """
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = (time.perf_counter() - start) / calls
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def assert_growth(name, small, large, ratio, limit):
+    """
+    Fail if an operation slowed down by more than limit when the ledger grew by ratio.
+    """
+    growth = large / small
+    assert growth <= limit, f"{name}: {growth:.1f}x slower on a {ratio}x larger ledger (limit {limit}x)"
+
+
+def test_scaling_bounds():
+    if not SCALING_TESTS:
+        return
+
+    small_n, ratio = 5000, 8
+    small, large = build_ledger(small_n), build_ledger(small_n * ratio)
+    timings = {}
+    for size, ledger in (("small", small), ("large", large)):
+        n = len(ledger)
+        counter = iter(range(10 ** 9))
+        last_id = ledger.transactions[-1]._id
+
+        # Warm the caches so the cached queries measure hits only.
+        ledger.find_by_category("Rare")
+        ledger.monthly_summary()
+        ledger.sorted_by("amount")
+
+        timings[size] = {
+            # O(1): appending and updating the running summaries.
+            "add": per_call(lambda: ledger.add(Transaction(5, "Food", "2025-01-01")), 2000),
+            # O(result): cache hits only copy the (fixed-size) result.
+            "find_by_category hit": per_call(lambda: ledger.find_by_category("Rare"), 2000),
+            # O(months): the monthly summary hit copies one entry per month.
+            "monthly_summary hit": per_call(ledger.monthly_summary, 2000),
+            # O(1): a cached sort only wraps the permutation in a view.
+            "sorted_by hit": per_call(lambda: ledger.sorted_by("amount"), 2000),
+            # O(n): one scan per uncached query or update by ID.
+            "find_by_category miss": per_call(
+                lambda: ledger.find_by_category(f"Missing {next(counter)}"), max(20, 200000 // n)),
+            "update last": per_call(lambda: ledger.update(last_id, note="x"), max(20, 200000 // n)),
+            # O(n log k): a heap of 10 entries over one category.
+            "top_n": per_call(lambda: ledger.top_n(10, category="Food"), max(5, 50000 // n)),
+        }
+
+    for name in timings["small"]:
+        constant = "hit" in name or name == "add"
+        assert_growth(name, timings["small"][name], timings["large"][name], ratio, 3 if constant else ratio * 2)
+
+
 def run_all_tests():
     test_add_and_len()
     test_find_by_category()
@@ -78,6 +574,17 @@ def run_all_tests():
     test_monthly_summary()
     test_remove()
     test_invalid_amount()
+    test_query_cache_hits_and_invalidation()
+    test_query_cache_per_category_invalidation()
+    test_query_cache_lru_eviction()
+    test_import_rejects_exact_duplicates()
+    test_import_fuzzy_merge_and_report()
+    test_duplicate_index_rows()
+    test_budget_running_totals()
+    test_sorted_by_multiple_columns_and_cache()
+    test_top_n()
+    test_differential_random_sequences()
+    test_scaling_bounds()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+"""
+Unit tests for the RecurringRule class and its lazy expansion in the Ledger.
+"""
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from data_io.storage import load_rules, save_rules
+from models.ledger import Ledger
+from models.recurring import RecurringRule
+from models.transaction import Transaction
+
+def test_monthly_clamps_to_month_end():
+    rule = RecurringRule(100, "Rent", "2025-01-31")
+
+    dates = list(rule.occurrence_dates(None, date(2025, 4, 30)))
+
+    assert dates == [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)]
+
+
+def test_weekly_and_daily_ranges():
+    weekly = RecurringRule(5, "Transit", "2025-12-01", frequency="weekly", interval=2)
+    daily = RecurringRule(1, "Coffee", "2025-12-01", end_str="2025-12-10", frequency="daily", interval=3)
+
+    assert list(weekly.occurrence_dates(date(2025, 12, 2), date(2025, 12, 31))) == [date(2025, 12, 15), date(2025, 12, 29)]
+    assert list(daily.occurrence_dates(None, date(2026, 1, 1))) == [
+        date(2025, 12, 1), date(2025, 12, 4), date(2025, 12, 7), date(2025, 12, 10)
+    ]
+
+
+def test_count_matches_expansion():
+    rule = RecurringRule(9.99, "Streaming", "2020-01-15", frequency="monthly", interval=1)
+    start, end = date(2021, 3, 1), date(2030, 6, 14)
+
+    assert rule.count(start, end) == len(list(rule.occurrences(start, end)))
+
+
+def test_invalid_rule():
+    try:
+        RecurringRule(10, "Rent", "2025-12-01", frequency="yearly")
+        assert False
+    except ValueError:
+        assert True
+
+
+def test_ledger_expands_rules_lazily():
+    ledger = Ledger()
+    ledger.add(Transaction(20, "Food", "2025-11-05"))
+    ledger.add_rule(RecurringRule(300, "Rent", "2025-10-01", end_str="2025-12-31"))
+
+    assert len(ledger) == 1
+    assert ledger.monthly_summary() == {"2025-10": 300, "2025-11": 320, "2025-12": 300}
+    assert ledger.total_amount() == 920
+
+    november = ledger.find_by_date_range(date(2025, 11, 1), date(2025, 11, 30))
+    assert sorted(t.amount for t in november) == [20, 300]
+
+    # Occurrences are labelled with their rule, and date-filtered top-N agrees with the date range.
+    assert [(t._id, t.rule_id) for t in november] == [(1, None), (None, 1)]
+    top = ledger.top_n(5, start_date=date(2025, 11, 1), end_date=date(2025, 11, 30))
+    assert [t.amount for t in top] == [300, 20]
+    assert [t.amount for t in ledger.top_n(5, category="Rent", start_date=date(2025, 1, 1))] == [300, 300, 300]
+
+    # Views of the stored transactions only leave them out.
+    assert [t.amount for t in ledger.top_n(5)] == [20]
+    assert [t.amount for t in ledger.sorted_by("-amount")] == [20]
+
+
+def test_future_occurrences_are_not_counted():
+    ledger = Ledger()
+    tomorrow = date.today() + timedelta(days=1)
+    ledger.add_rule(RecurringRule(10, "Gym", tomorrow.isoformat(), frequency="weekly"))
+
+    assert ledger.total_amount() == 0
+    assert ledger.find_by_date_range(tomorrow, tomorrow + timedelta(days=30)) == []
+
+
+def test_materialize_rules_once():
+    ledger = Ledger()
+    ledger.add_rule(RecurringRule(300, "Rent", "2025-10-01", end_str="2025-12-31"))
+
+    assert ledger.materialize_rules(date(2025, 11, 15)) == 2
+    assert ledger.materialize_rules(date(2025, 11, 30)) == 0
+    assert len(ledger) == 2
+
+    # Materialized occurrences are not generated again.
+    assert ledger.total_amount() == 900
+
+
+def test_rules_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "recurring.csv"
+        rule = RecurringRule(15, "Music", "2025-01-10", frequency="weekly", interval=2,
+                             materialized_through="2025-02-01", _id=1)
+
+        save_rules(path, [rule])
+        loaded = load_rules(path)[0]
+
+        assert (loaded.frequency, loaded.interval, loaded.end) == ("weekly", 2, None)
+        assert loaded.materialized_through == date(2025, 2, 1)
+
+
+def run_all_tests():
+    test_monthly_clamps_to_month_end()
+    test_weekly_and_daily_ranges()
+    test_count_matches_expansion()
+    test_invalid_rule()
+    test_ledger_expands_rules_lazily()
+    test_future_occurrences_are_not_counted()
+    test_materialize_rules_once()
+    test_rules_round_trip()
+
+
+if __name__ == "__main__":
+    print("Running recurring tests...")
+    run_all_tests()
+    print("Recurring tests passed.")
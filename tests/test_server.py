@@ -0,0 +1,202 @@
+"""
+Unit tests for the asyncio JSON API server.
+"""
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from api.server import LedgerServer, load_ledger
+from data_io.export import archive_closed_months
+from data_io.ledger_files import LedgerFiles
+from data_io.storage import load_csv, save_csv, transactions_to_rows
+from models.ledger import Ledger
+from models.recurring import RecurringRule
+from models.transaction import Transaction
+
+async def request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+
+    head, _, content = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+
+    # Decode chunked responses.
+    if b"Transfer-Encoding: chunked" in head:
+        data = b""
+        while True:
+            size_line, _, content = content.partition(b"\r\n")
+            size = int(size_line, 16)
+            if size == 0:
+                break
+            data += content[:size]
+            content = content[size + 2:]
+        content = data
+
+    return status, json.loads(content.decode("utf-8"))
+
+
+async def raw_status(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    return int(raw.split()[1])
+
+
+def run_with_server(scenario, chunk_size=2):
+    async def runner():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "expenses.csv"
+            ledger = Ledger()
+            ledger.add(Transaction(10, "Food", "2025-12-01"))
+            ledger.add(Transaction(300, "Rent", "2025-11-01"))
+            ledger.add(Transaction(20, "Food", "2025-12-05"))
+
+            files = LedgerFiles(path, Path(tmp) / "archive")
+            server = await LedgerServer(ledger, files, chunk_size=chunk_size).start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                await scenario(port, path)
+            finally:
+                server.close()
+                await server.wait_closed()
+
+    asyncio.run(runner())
+
+
+def test_list_and_summaries():
+    async def scenario(port, path):
+        status, items = await request(port, "GET", "/transactions")
+        assert status == 200
+        assert [item["id"] for item in items] == [1, 2, 3]
+
+        _, foods = await request(port, "GET", "/transactions?category=Food&start=2025-12-02")
+        assert [item["amount"] for item in foods] == [20]
+
+        _, summary = await request(port, "GET", "/summary/monthly")
+        assert summary == {"2025-12": 30, "2025-11": 300}
+
+        _, total = await request(port, "GET", "/total")
+        assert total["total"] == 330
+
+    run_with_server(scenario)
+
+
+def test_writes_are_persisted():
+    async def scenario(port, path):
+        results = await asyncio.gather(*[
+            request(port, "POST", "/transactions", {"amount": 5, "category": "Coffee", "date": "2025-12-0" + str(day)})
+            for day in range(1, 6)
+        ])
+        assert all(status == 201 for status, _ in results)
+        assert sorted(item["id"] for _, item in results) == [4, 5, 6, 7, 8]
+
+        status, updated = await request(port, "PATCH", "/transactions/1", {"amount": 11})
+        assert status == 200 and updated["amount"] == 11
+
+        status, _ = await request(port, "DELETE", "/transactions/2")
+        assert status == 200
+
+        rows = load_csv(path)
+        assert len(rows) == 7
+        assert rows[0]["amount"] == "11.0"
+
+    run_with_server(scenario)
+
+
+def test_errors():
+    async def scenario(port, path):
+        status, body = await request(port, "POST", "/transactions", {"amount": -1, "category": "Food", "date": "2025-12-01"})
+        assert status == 400 and "error" in body
+
+        status, _ = await request(port, "DELETE", "/transactions/99")
+        assert status == 404
+
+        status, _ = await request(port, "GET", "/nope")
+        assert status == 404
+
+        for length in ("abc", "-5", "1e3"):
+            status = await raw_status(port, f"POST /transactions HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}".encode("latin-1"))
+            assert status == 400
+
+    run_with_server(scenario)
+
+
+def test_archived_months_are_served():
+    async def runner():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "expenses.csv"
+            files = LedgerFiles(path, Path(tmp) / "archive")
+            save_csv(path, transactions_to_rows([
+                Transaction(300, "Rent", "2025-11-01", _id=1),
+                Transaction(10, "Food", "2025-12-01", _id=2),
+            ]))
+            archive_closed_months(path, "2025-12", files.archive_dir)
+
+            server = await LedgerServer(load_ledger(files), files).start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                _, total = await request(port, "GET", "/total")
+                assert total["total"] == 310
+
+                # Editing an archived transaction writes it back to its archive, not the live file.
+                status, _ = await request(port, "PATCH", "/transactions/1", {"amount": 310})
+                assert status == 200
+                assert [float(row["amount"]) for row in load_csv(path)] == [10]
+                assert load_ledger(LedgerFiles(path, files.archive_dir)).total_amount() == 320
+            finally:
+                server.close()
+                await server.wait_closed()
+
+    asyncio.run(runner())
+
+
+def test_recurring_occurrences_are_served():
+    async def runner():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "expenses.csv"
+            files = LedgerFiles(path, Path(tmp) / "archive")
+            save_csv(path, transactions_to_rows([Transaction(10, "Food", "2025-01-05", _id=1)]))
+            with_rules = Ledger()
+            with_rules.add_rule(RecurringRule(300, "Rent", "2025-01-01", "2025-02-28"))
+            files.save_rules(with_rules)
+
+            server = await LedgerServer(load_ledger(files), files).start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                _, total = await request(port, "GET", "/total")
+                assert total["total"] == 610
+                _, summary = await request(port, "GET", "/summary/monthly")
+                assert summary == {"2025-01": 310, "2025-02": 300}
+
+                _, listed = await request(port, "GET", "/transactions?start=2025-01-01&end=2025-01-31")
+                assert [(t["id"], t["rule_id"], t["amount"]) for t in listed] == [(1, None, 10), (None, 1, 300)]
+                # Without a date filter only stored transactions are listed.
+                _, listed = await request(port, "GET", "/transactions")
+                assert [t["id"] for t in listed] == [1]
+            finally:
+                server.close()
+                await server.wait_closed()
+
+    asyncio.run(runner())
+
+
+def run_all_tests():
+    test_list_and_summaries()
+    test_writes_are_persisted()
+    test_errors()
+    test_archived_months_are_served()
+    test_recurring_occurrences_are_served()
+
+
+if __name__ == "__main__":
+    print("Running server tests...")
+    run_all_tests()
+    print("Server tests passed.")
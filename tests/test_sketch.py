@@ -0,0 +1,92 @@
+"""
+Unit tests for the quantile sketch, histogram, and per-group spending statistics.
+"""
+import random
+from models.ledger import Ledger
+from models.sketch import QuantileSketch, Histogram
+from models.transaction import Transaction
+from data_io.storage import load_csv, rows_to_transactions
+
+def exact_quantile(values, q):
+    # Same rank definition as QuantileSketch.quantile.
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_sketch_accuracy_against_exact():
+    rng = random.Random(2025)
+    values = [round(rng.lognormvariate(3, 1.2), 2) + 0.01 for _ in range(20000)]
+
+    sketch = QuantileSketch(0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.99):
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+
+def test_sketch_accuracy_on_sample_data():
+    amounts = [t.amount for t in rows_to_transactions(load_csv("data/expenses.csv"))]
+
+    sketch = QuantileSketch(0.01)
+    for amount in amounts:
+        sketch.add(amount)
+
+    for q in (0.5, 0.9, 0.99):
+        exact = exact_quantile(amounts, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+
+def test_sketch_merge_remove_and_round_trip():
+    a, b = QuantileSketch(), QuantileSketch()
+    for value in (1, 2, 3):
+        a.add(value)
+    for value in (4, 5):
+        b.add(value)
+
+    a.merge(b)
+    a.remove(5)
+    restored = QuantileSketch.from_dict(a.to_dict())
+
+    assert restored.count == 4
+    assert abs(restored.quantile(1) - 4) <= 0.04
+
+
+def test_histogram_bins():
+    histogram = Histogram((5, 10))
+    for value in (1, 5, 6, 10, 11):
+        histogram.add(value)
+
+    assert histogram.counts == [2, 2, 1]
+    assert histogram.labels() == ["$0-$5", "$5-$10", ">$10"]
+
+
+def test_ledger_stats_follow_mutations():
+    ledger = Ledger()
+    ledger.add(Transaction(10, "Food", "2025-12-01"))
+    ledger.add(Transaction(30, "Food", "2025-12-02"))
+    ledger.add(Transaction(300, "Rent", "2025-12-01"))
+
+    assert ledger.stats.sketch("2025-12", "Food").count == 2
+    assert ledger.stats.sketch(category="Rent").count == 1
+
+    ledger.update(2, category="Rent")
+    ledger.remove(1)
+
+    assert ledger.stats.categories("2025-12") == ["Rent"]
+    assert ledger.stats.histogram("2025-12").counts[3] == 1
+
+
+def run_all_tests():
+    test_sketch_accuracy_against_exact()
+    test_sketch_accuracy_on_sample_data()
+    test_sketch_merge_remove_and_round_trip()
+    test_histogram_bins()
+    test_ledger_stats_follow_mutations()
+
+
+if __name__ == "__main__":
+    print("Running sketch tests...")
+    run_all_tests()
+    print("Sketch tests passed.")
@@ -0,0 +1,350 @@
+"""
+Unit tests for the CSV storage helpers.
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import date
+from pathlib import Path
+from data_io.export import (
+    archive_closed_months,
+    archived_months,
+    export_transactions,
+    iter_archived_rows,
+    load_partition_metadata,
+)
+from data_io.ledger_files import LedgerFiles
+from data_io.loader import BackgroundLoader, PendingLedger
+from data_io.reconcile import reconcile, iter_statement, MATCHED, MISSING_IN_LEDGER, MISSING_IN_STATEMENT
+from data_io.storage import load_csv, save_csv, update_csv, rows_to_transactions, transactions_to_rows
+from models.ledger import Ledger
+from models.recurring import RecurringRule
+from models.transaction import Transaction
+
+def test_save_and_load_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv"
+        transactions = [
+            Transaction(10, "Food", "2025-12-01", "lunch", _id=1),
+            Transaction(300, "Rent", "2025-11-01", "", _id=2),
+        ]
+
+        save_csv(path, transactions_to_rows(transactions))
+        loaded = rows_to_transactions(load_csv(path))
+
+        assert [t.amount for t in loaded] == [300, 10]
+        assert loaded[1].note == "lunch"
+
+
+def test_save_leaves_no_temp_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv"
+        save_csv(path, [])
+        save_csv(path, transactions_to_rows([Transaction(5, "Food", "2025-12-01", _id=1)]))
+
+        names = sorted(os.listdir(tmp))
+        assert names == ["expenses.csv", "expenses.csv.lock"]
+        assert len(load_csv(path)) == 1
+
+
+def test_update_csv_read_modify_write():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv"
+        save_csv(path, transactions_to_rows([Transaction(5, "Food", "2025-12-01", _id=1)]))
+
+        update_csv(path, lambda rows: rows + transactions_to_rows([Transaction(7, "Rent", "2025-12-02", _id=2)]))
+
+        assert [row["amount"] for row in load_csv(path)] == ["5", "7"]
+
+
+def test_concurrent_saves_merge_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv"
+        save_csv(path, transactions_to_rows([
+            Transaction(10, "Food", "2025-12-01", _id=1),
+            Transaction(20, "Food", "2025-12-02", _id=2),
+            Transaction(30, "Rent", "2025-12-03", _id=3),
+        ]))
+
+        # Two programs load the same file, then each makes its own changes and saves.
+        first_files, second_files = LedgerFiles(path, Path(tmp) / "archive"), LedgerFiles(path, Path(tmp) / "archive")
+        first, second = Ledger(), Ledger()
+        first_files.load(first)
+        second_files.load(second)
+
+        first.add(Transaction(5, "Coffee", "2025-12-04"))
+        first.update(1, note="lunch")
+        first.budget.set_limit("Food", 100)
+        first.add_rule(RecurringRule(300, "Rent", "2025-12-01"))
+        second.add(Transaction(7, "Snacks", "2025-12-05"))
+        second.remove(3)
+        second.budget.set_limit("Rent", 900)
+
+        for ledger, files in ((first, first_files), (second, second_files)):
+            files.save(ledger)
+            files.save_budgets(ledger)
+            files.save_rules(ledger)
+
+        rows = load_csv(path)
+        assert [(float(row["amount"]), row["note"]) for row in rows] == [(10, "lunch"), (20, ""), (5, ""), (7, "")]
+        assert len({row["id"] for row in rows}) == 4
+
+        merged = Ledger()
+        merged_files = LedgerFiles(path, Path(tmp) / "archive")
+        merged_files.load(merged)
+        merged_files.load_budgets(merged)
+        merged_files.load_rules(merged)
+        assert merged.budget.limits == {"Food": 100, "Rent": 900}
+        assert len(merged.rules) == 1
+
+        # Saving again without changes keeps the other program's edits too.
+        first_files.save(first)
+        assert len(load_csv(path)) == 4
+
+
+def test_ledger_files_keep_ids_across_archives():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv"
+        archive_dir = Path(tmp) / "archive"
+        save_csv(path, transactions_to_rows([
+            Transaction(10, "Food", "2025-11-05", _id=7),
+            Transaction(20, "Food", "2025-12-02", _id=3),
+            Transaction(30, "Rent", "2025-12-02", _id=9),
+        ]))
+        archive_closed_months(path, "2025-12", archive_dir)
+
+        files = LedgerFiles(path, archive_dir)
+        ledger = Ledger()
+        files.load(ledger)
+        # Moving the archived transaction into a live month keeps its ID, so it still sorts between
+        # the two December ones; a new transaction gets an ID after every ID in either file.
+        ledger.update(1, date=date(2025, 12, 2))
+        ledger.add(Transaction(5, "Coffee", "2025-11-06"))
+        files.save(ledger)
+
+        assert [(row["id"], row["date"]) for row in load_csv(path)] == [
+            ("3", "2025-12-02"), ("7", "2025-12-02"), ("9", "2025-12-02")
+        ]
+        assert [row["id"] for row in iter_archived_rows(archive_dir)] == ["10"]
+
+
+def test_saves_follow_rows_archived_by_another_program():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv"
+        archive_dir = Path(tmp) / "archive"
+        save_csv(path, transactions_to_rows([
+            Transaction(10, "Rent", "2025-11-01", _id=1),
+            Transaction(20, "Food", "2025-11-02", _id=2),
+            Transaction(30, "Food", "2025-12-01", _id=3),
+            Transaction(40, "Fun", "2025-12-02", _id=4),
+        ]))
+        files = LedgerFiles(path, archive_dir)
+        ledger = Ledger()
+        files.load(ledger)
+
+        # Another program archives November and deletes a December expense while this one edits.
+        archive_closed_months(path, "2025-12", archive_dir)
+        save_csv(path, [row for row in load_csv(path) if row["id"] != "4"])
+        ledger.update(1, note="edited")
+        ledger.remove(2)
+        ledger.update(4, note="edited")
+        files.save(ledger)
+        files.save(ledger)
+
+        # The edit and removal went to the archive; the deleted expense was not written back.
+        assert [row["id"] for row in load_csv(path)] == ["3"]
+        assert [(row["id"], row["note"]) for row in iter_archived_rows(archive_dir)] == [("1", "edited")]
+        assert load_partition_metadata(archive_dir)["2025-11"]["count"] == 1
+
+        reloaded = Ledger()
+        LedgerFiles(path, archive_dir).load(reloaded)
+        assert [(t.amount, t.note) for t in reloaded] == [(10, "edited"), (30, "")]
+
+
+def test_export_filtered_jsonl_gz():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "out.jsonl.gz"
+        transactions = (
+            Transaction(amount, category, day, _id=i)
+            for i, (amount, category, day) in enumerate([
+                (10, "Food", "2025-11-30"),
+                (20, "Food", "2025-12-01"),
+                (30, "Rent", "2025-12-02"),
+            ], start=1)
+        )
+
+        count = export_transactions(transactions, path, start_date=date(2025, 12, 1), category="Food")
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert count == 1
+        assert records == [{"id": 2, "amount": 20, "category": "Food", "date": "2025-12-01", "note": ""}]
+
+
+def test_compressed_csv_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv.xz"
+        save_csv(path, transactions_to_rows([Transaction(5, "Food", "2025-12-01", _id=1)]))
+
+        assert load_csv(path)[0]["category"] == "Food"
+
+
+def test_archive_closed_months():
+    with tempfile.TemporaryDirectory() as tmp:
+        live = Path(tmp) / "expenses.csv"
+        archive_dir = Path(tmp) / "archive"
+        save_csv(live, transactions_to_rows([
+            Transaction(10, "Food", "2025-10-03", _id=1),
+            Transaction(20, "Food", "2025-11-04", _id=2),
+            Transaction(30, "Rent", "2025-12-01", _id=3),
+        ]))
+
+        counts = archive_closed_months(live, "2025-11", archive_dir)
+        assert counts == {"2025-10": 1}
+
+        # Archiving again merges into the existing archive for the month.
+        save_csv(live, load_csv(live) + transactions_to_rows([Transaction(5, "Food", "2025-10-09", _id=4)]))
+        counts = archive_closed_months(live, "2025-12", archive_dir)
+        assert counts == {"2025-10": 1, "2025-11": 1}
+
+        assert sorted(archived_months(archive_dir)) == ["2025-10", "2025-11"]
+        assert [row["id"] for row in load_csv(live)] == ["3"]
+        assert sorted(row["id"] for row in iter_archived_rows(archive_dir)) == ["1", "2", "4"]
+
+        # Rows archived later but dated earlier are merged in date order.
+        save_csv(live, load_csv(live) + transactions_to_rows([Transaction(7, "Food", "2025-10-01", _id=5)]))
+        archive_closed_months(live, "2025-12", archive_dir)
+        assert [row["date"] for row in load_csv(archived_months(archive_dir)["2025-10"])] == [
+            "2025-10-01", "2025-10-03", "2025-10-09"
+        ]
+
+        metadata = load_partition_metadata(archive_dir)
+        assert metadata["2025-10"]["count"] == 3
+        assert metadata["2025-10"]["categories"]["Food"].count == 3
+
+        # Months that would not compare correctly as strings are rejected, and nothing is moved.
+        for before_month in ("2026", "2025-1", "2025-13"):
+            try:
+                archive_closed_months(live, before_month, archive_dir)
+                assert False, before_month
+            except ValueError:
+                pass
+        assert [row["id"] for row in load_csv(live)] == ["3"]
+        assert not [name for name in os.listdir(archive_dir) if name.endswith(".tmp")]
+
+
+def test_reconcile_sorted_merge():
+    with tempfile.TemporaryDirectory() as tmp:
+        statement_path = Path(tmp) / "statement.csv"
+        statement_path.write_text(
+            "date,amount,description\n"
+            "2025-12-01,-10.00,coffee shop\n"
+            "2025-12-02,-300.00,RENT\n"
+            "2025-12-03,-45.50,grocery\n"
+            "2025-12-05,2500.00,SALARY\n"
+            "2025-12-09,-99.99,unknown\n",
+            encoding="utf-8",
+        )
+        ledger_entries = [
+            Transaction(8, "Food", "2025-11-20", _id=1),
+            Transaction(10, "Food", "2025-12-01", _id=2),
+            Transaction(45.5, "Food", "2025-12-04", _id=3),
+            Transaction(12, "Transport", "2025-12-05", _id=4),
+            Transaction(30, "Fun", "2025-12-10", _id=5),
+            Transaction(60, "Fun", "2025-12-28", _id=6),
+        ]
+
+        rent = RecurringRule(300, "Rent", "2025-11-02", "2026-03-02", _id=7)
+
+        results = list(reconcile(iter_statement(statement_path), ledger_entries, days=1, rules=[rent]))
+
+        statuses = sorted((status, (s or l).date.day) for status, s, l in results)
+        # The salary credit is not an expense; ledger entries (and rent occurrences) outside
+        # the statement period ± 1 day are left out. The rent is covered by the recurring rule.
+        assert statuses == [
+            (MATCHED, 1),
+            (MATCHED, 2),
+            (MATCHED, 3),
+            (MISSING_IN_LEDGER, 9),
+            (MISSING_IN_STATEMENT, 5),
+            (MISSING_IN_STATEMENT, 10),
+        ]
+        assert [l.rule_id for status, s, l in results if status == MATCHED and s.amount == 300] == [7]
+
+
+def test_reconcile_rejects_unsorted_input():
+    unsorted = [Transaction(10, "Food", "2025-12-05"), Transaction(10, "Food", "2025-12-01")]
+    try:
+        list(reconcile(iter([Transaction(10, "Food", "2025-12-05")]), unsorted))
+        assert False
+    except ValueError:
+        assert True
+
+
+def test_background_loader_and_pending_ledger():
+    def load(ledger, report, progress):
+        ledger.add(Transaction(10, "Food", "2025-12-01"))
+        progress(1, 1)
+        report("Loaded 1 transactions.", "green")
+        return {"2025-12": 1}
+
+    loader = BackgroundLoader(load)
+    pending = PendingLedger()
+    pending.add(Transaction(5, "Food", "2025-12-02"))
+    assert len(pending) == 1 and pending.queued[0]._id is None
+
+    loader.start()
+    assert loader.wait(5)
+    assert loader.result == {"2025-12": 1}
+    assert loader.status() == "Loaded 1 transactions."
+
+    queued = pending.drain_into(loader.ledger)
+    assert [t._id for t in queued] == [2]
+    assert len(loader.ledger) == 2 and len(pending) == 0
+
+
+def test_ledger_files_report_progress_while_reading():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "expenses.csv"
+        save_csv(path, transactions_to_rows([Transaction(1, "Food", "2025-12-01", _id=i) for i in range(1, 25001)]))
+
+        calls = []
+        LedgerFiles(path, Path(tmp) / "archive").load(Ledger(), lambda loaded, total: calls.append((loaded, total)))
+
+        # Rows are counted while the file is read, before any transaction is added.
+        assert calls[:2] == [(10000, None), (20000, None)]
+        assert calls[-1] == (25000, 25000)
+
+
+def test_background_loader_reports_errors():
+    def load(ledger, report, progress):
+        raise RuntimeError("disk on fire")
+
+    loader = BackgroundLoader(load).start()
+    assert loader.wait(5)
+    assert isinstance(loader.error, RuntimeError)
+    assert "disk on fire" in loader.status()
+
+
+def run_all_tests():
+    test_save_and_load_round_trip()
+    test_save_leaves_no_temp_files()
+    test_update_csv_read_modify_write()
+    test_concurrent_saves_merge_changes()
+    test_ledger_files_keep_ids_across_archives()
+    test_saves_follow_rows_archived_by_another_program()
+    test_export_filtered_jsonl_gz()
+    test_compressed_csv_round_trip()
+    test_archive_closed_months()
+    test_reconcile_sorted_merge()
+    test_reconcile_rejects_unsorted_input()
+    test_background_loader_and_pending_ledger()
+    test_ledger_files_report_progress_while_reading()
+    test_background_loader_reports_errors()
+
+
+if __name__ == "__main__":
+    print("Running storage tests...")
+    run_all_tests()
+    print("Storage tests passed.")
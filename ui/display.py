@@ -20,11 +20,13 @@ def pause():
     input()
 
 
-def show_menu():
+def show_menu(status=None):
     """
-    Display the main program menu.
+    Display the main program menu, with an optional status line (e.g. loading progress).
     """
     print_message(LEDGER_SHREDDER_LOGO, "title")
+    if status:
+        print_message(status, "blue")
 
     print_message("1. Add new expense", "info")
     print_message("2. Edit expense", "info")
@@ -34,6 +36,12 @@ def show_menu():
     print_message("6. List by date range", "info")
     print_message("7. Monthly summary", "info")
     print_message("8. Show total spending", "info")
+    print_message("10. Import expenses from CSV", "info")
+    print_message("11. Budgets", "info")
+    print_message("12. Reconcile bank statement", "info")
+    print_message("13. Spending statistics", "info")
+    print_message("14. Sorted / top expenses", "info")
+    print_message("15. Recurring expenses", "info")
     print()
 
     print_message("9. Save & Exit", "yellow")
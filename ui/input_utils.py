@@ -26,4 +26,18 @@ def input_date(prompt_text):
         try:
             return datetime.strptime(date_str, "%Y-%m-%d").date()
         except ValueError:
-            print_message("Invalid date format. Please use YYYY-MM-DD.", "red")
\ No newline at end of file
+            print_message("Invalid date format. Please use YYYY-MM-DD.", "red")
+
+
+def input_optional_date(prompt_text):
+    """
+    Prompt until a valid YYYY-MM-DD date is entered, or return None if the user presses Enter.
+    """
+    while True:
+        date_str = input(prompt_text).strip()
+        if not date_str:
+            return None
+        try:
+            return datetime.strptime(date_str, "%Y-%m-%d").date()
+        except ValueError:
+            print_message("Invalid date format. Please use YYYY-MM-DD.", "red")
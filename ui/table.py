@@ -1,6 +1,8 @@
 """
 Utility for formatting tables with borders and aligned columns.
 """
+# Columns holding money values are right-aligned.
+RIGHT_ALIGNED = ("Amount", "Total", "Spent", "Budget", "Remaining", "Median", "P90", "P99")
 
 def format_table(rows, headers):
     """
@@ -34,7 +36,7 @@ def format_table(rows, headers):
         for i in range(num_cols):
             value = str(row[i])
 
-            if headers[i] in ("Amount", "Total"):
+            if headers[i] in RIGHT_ALIGNED:
                 value = value.rjust(col_widths[i])
             else:
                 value = value.ljust(col_widths[i])